@@ -0,0 +1,47 @@
+"""Add category_stats
+
+Revision ID: 1e9b6c3d8f47
+Revises: 7c4f1a9e2d60
+Create Date: 2026-10-17 22:05:37.914206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e9b6c3d8f47'
+down_revision: Union[str, None] = '7c4f1a9e2d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('category_stats',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('product_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('in_stock_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=True),
+    sa.Column('max_price', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('category_id')
+    )
+    # Backfill from the current products
+    op.execute(
+        """
+        INSERT INTO category_stats (category_id, product_count, in_stock_count, min_price, max_price, updated_at)
+        SELECT category_id, count(*), count(*) FILTER (WHERE stock > 0), min(price), max(price), now()
+        FROM products
+        WHERE category_id IS NOT NULL AND is_active IS NOT false
+        GROUP BY category_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('category_stats')
@@ -0,0 +1,28 @@
+"""Add name index to products for bulk import matching
+
+Revision ID: 3f8a61d2b0c4
+Revises: b7d03e5f1c88
+Create Date: 2026-10-17 12:08:37.219564
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a61d2b0c4'
+down_revision: Union[str, None] = 'b7d03e5f1c88'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_name', 'products', ['name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_name', table_name='products')
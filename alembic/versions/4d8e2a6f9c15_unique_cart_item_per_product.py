@@ -0,0 +1,53 @@
+"""Unique cart_items (cart_id, product_id)
+
+Revision ID: 4d8e2a6f9c15
+Revises: 9a2d5e7c1b84
+Create Date: 2026-10-17 23:02:51.370925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d8e2a6f9c15'
+down_revision: Union[str, None] = '9a2d5e7c1b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fold duplicate lines into the oldest one (quantities summed) before the
+    # constraint can be added
+    op.execute(
+        """
+        WITH dupes AS (
+            SELECT id,
+                   min(id) OVER (PARTITION BY cart_id, product_id) AS keep_id,
+                   sum(quantity) OVER (PARTITION BY cart_id, product_id) AS total
+            FROM cart_items
+        )
+        UPDATE cart_items SET quantity = dupes.total
+        FROM dupes
+        WHERE cart_items.id = dupes.id AND dupes.id = dupes.keep_id AND cart_items.quantity <> dupes.total
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM cart_items a
+        USING cart_items b
+        WHERE a.cart_id = b.cart_id AND a.product_id = b.product_id AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint('uq_cart_items_cart_id_product_id', 'cart_items', ['cart_id', 'product_id'])
+    # The constraint's index covers the plain one
+    op.drop_index('ix_cart_items_cart_id_product_id', table_name='cart_items')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_cart_items_cart_id_product_id', 'cart_items', ['cart_id', 'product_id'], unique=False)
+    op.drop_constraint('uq_cart_items_cart_id_product_id', 'cart_items', type_='unique')
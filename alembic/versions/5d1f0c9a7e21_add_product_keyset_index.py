@@ -0,0 +1,28 @@
+"""Add keyset pagination index to products
+
+Revision ID: 5d1f0c9a7e21
+Revises: 843e38a63ead
+Create Date: 2026-10-17 09:12:44.102311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1f0c9a7e21'
+down_revision: Union[str, None] = '843e38a63ead'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_category_id_id', 'products', ['category_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_category_id_id', table_name='products')
@@ -0,0 +1,28 @@
+"""Add image_variants to products
+
+Revision ID: 6b2e9d4a7f13
+Revises: d24e7f90a1b3
+Create Date: 2026-10-17 14:21:37.905114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2e9d4a7f13'
+down_revision: Union[str, None] = 'd24e7f90a1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'image_variants')
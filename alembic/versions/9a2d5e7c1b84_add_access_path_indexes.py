@@ -0,0 +1,55 @@
+"""Add foreign-key and catalog access-path indexes
+
+Revision ID: 9a2d5e7c1b84
+Revises: 1e9b6c3d8f47
+Create Date: 2026-10-17 22:31:08.446120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a2d5e7c1b84'
+down_revision: Union[str, None] = '1e9b6c3d8f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, partial-index predicate)
+INDEXES = [
+    ('ix_products_active_category_id_price', 'products', ['category_id', 'price'], 'is_active IS NOT false'),
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], None),
+    ('ix_orders_address_id', 'orders', ['address_id'], None),
+    ('ix_order_items_order_id', 'order_items', ['order_id'], None),
+    ('ix_order_items_product_id', 'order_items', ['product_id'], None),
+    ('ix_order_coupons_order_id', 'order_coupons', ['order_id'], None),
+    ('ix_cart_items_cart_id_product_id', 'cart_items', ['cart_id', 'product_id'], None),
+    ('ix_cart_items_product_id', 'cart_items', ['product_id'], None),
+    ('ix_reviews_product_id', 'reviews', ['product_id'], None),
+    ('ix_reviews_user_id', 'reviews', ['user_id'], None),
+    ('ix_wishlists_user_id_product_id', 'wishlists', ['user_id', 'product_id'], None),
+    ('ix_wishlists_product_id', 'wishlists', ['product_id'], None),
+    ('ix_addresses_user_id', 'addresses', ['user_id'], None),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction; building this way keeps the
+    # tables writable. IF NOT EXISTS lets a re-run pick up after a failed build.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False, if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
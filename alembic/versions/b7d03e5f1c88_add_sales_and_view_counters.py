@@ -0,0 +1,47 @@
+"""Add sales and view counters to products
+
+Revision ID: b7d03e5f1c88
+Revises: e91b4d2c6a57
+Create Date: 2026-10-17 11:26:51.847203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d03e5f1c88'
+down_revision: Union[str, None] = 'e91b4d2c6a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('sales_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('products', sa.Column('view_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Seed sales from existing orders so "top" is meaningful immediately
+    op.execute("""
+        UPDATE products SET sales_count = s.sold
+        FROM (
+            SELECT oi.product_id, SUM(oi.quantity) AS sold
+            FROM order_items oi JOIN orders o ON o.id = oi.order_id
+            WHERE o.status <> 'cancelled'
+            GROUP BY oi.product_id
+        ) AS s
+        WHERE products.id = s.product_id
+    """)
+
+    op.create_index('ix_products_sales_count_id', 'products', ['sales_count', 'id'], unique=False)
+    op.create_index('ix_products_view_count_id', 'products', ['view_count', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_view_count_id', table_name='products')
+    op.drop_index('ix_products_sales_count_id', table_name='products')
+    op.drop_column('products', 'view_count')
+    op.drop_column('products', 'sales_count')
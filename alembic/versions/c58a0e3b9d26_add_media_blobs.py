@@ -0,0 +1,44 @@
+"""Add media_blobs and products.image_hash
+
+Revision ID: c58a0e3b9d26
+Revises: 6b2e9d4a7f13
+Create Date: 2026-10-17 15:48:02.116734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58a0e3b9d26'
+down_revision: Union[str, None] = '6b2e9d4a7f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_blobs',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('storage_key', sa.String(length=255), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('derived', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.add_column('products', sa.Column('image_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_products_image_hash'), 'products', ['image_hash'], unique=False)
+    op.create_foreign_key('products_image_hash_fkey', 'products', 'media_blobs', ['image_hash'], ['hash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('products_image_hash_fkey', 'products', type_='foreignkey')
+    op.drop_index(op.f('ix_products_image_hash'), table_name='products')
+    op.drop_column('products', 'image_hash')
+    op.drop_table('media_blobs')
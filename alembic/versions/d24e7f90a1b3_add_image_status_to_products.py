@@ -0,0 +1,29 @@
+"""Add image_status to products
+
+Revision ID: d24e7f90a1b3
+Revises: 3f8a61d2b0c4
+Create Date: 2026-10-17 13:02:11.482905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd24e7f90a1b3'
+down_revision: Union[str, None] = '3f8a61d2b0c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('image_status', sa.String(length=20), nullable=True))
+    op.execute("UPDATE products SET image_status = 'ready' WHERE image_url IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'image_status')
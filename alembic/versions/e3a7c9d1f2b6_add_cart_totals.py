@@ -0,0 +1,42 @@
+"""Add running totals to carts
+
+Revision ID: e3a7c9d1f2b6
+Revises: 4d8e2a6f9c15
+Create Date: 2026-10-17 23:34:19.082417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c9d1f2b6'
+down_revision: Union[str, None] = '4d8e2a6f9c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('carts', sa.Column('subtotal', sa.Float(), server_default='0', nullable=False))
+    op.add_column('carts', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        """
+        UPDATE carts
+        SET subtotal = totals.subtotal, item_count = totals.item_count
+        FROM (
+            SELECT cart_id, sum(price_at_addition * quantity) AS subtotal, sum(quantity) AS item_count
+            FROM cart_items
+            GROUP BY cart_id
+        ) AS totals
+        WHERE carts.id = totals.cart_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('carts', 'item_count')
+    op.drop_column('carts', 'subtotal')
@@ -0,0 +1,228 @@
+import bisect
+import heapq
+import threading
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+import models
+
+# autocomplete.py
+# In-process prefix index behind GET /products/autocomplete.
+# Built once at startup from products and categories, then kept current by the
+# product/category CRUD functions, so a keystroke never costs a DB round trip.
+# Products are tracked by id, so deactivating or deleting one drops its own
+# suggestion and never a same-named product's.
+
+PRODUCT = "product"
+CATEGORY = "category"
+QUERY = "query"
+
+# Base weights: categories outrank single products; popular queries grow with use
+BASE_WEIGHTS = {PRODUCT: 1.0, CATEGORY: 2.0, QUERY: 0.0}
+MAX_QUERIES = 5000     # distinct popular queries kept
+SCAN_LIMIT = 500       # prefixes matching more keys than this are answered from a ranked top list
+TOP_N = 20             # suggestions a top list must be able to serve (the endpoint's maximum limit)
+TOP_KEEP = 2 * TOP_N   # keys kept per top list, so removals rarely force a rescan
+
+
+def normalize(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index.
+    Lookups bisect to the block of keys sharing the prefix and return the
+    highest-weighted terms from it; writes keep the array sorted in place.
+    A block of at most SCAN_LIMIT keys is ranked per keystroke. Larger blocks
+    (short or common prefixes) are ranked once, the first time they are asked
+    for, into a top list of TOP_KEEP keys that writes then keep current. A top
+    list is only re-ranked from its block after removals leave it with fewer
+    than TOP_N keys.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[str] = []   # sorted "<normalized term>\x00<kind>"
+        self._entries = {}           # key -> {"term", "type", "weight", "refs"}
+        self._products: Dict[int, str] = {}  # indexed (active) product id -> its key
+        self._top: Dict[str, List[str]] = {}  # prefix -> best keys of its block, highest weight first
+        self._cut: Set[str] = set()           # prefixes whose top list is shorter than their block
+        self._query_count = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def build(self, db: Session):
+        products = db.query(models.Product.id, models.Product.name).filter(models.Product.is_active.isnot(False)).all()
+        category_names = db.query(models.Category.name).all()
+
+        with self._lock:
+            queries = {k: e for k, e in self._entries.items() if e["type"] == QUERY}
+            self._entries = queries
+            self._products = {}
+            for product_id, name in products:
+                if name:
+                    self._products[product_id] = _key(name, PRODUCT)
+                    self._add_locked(name, PRODUCT)
+            for (name,) in category_names:
+                self._add_locked(name, CATEGORY)
+            self._keys = sorted(self._entries)
+            self._top, self._cut = {}, set()
+
+    def add(self, term: Optional[str], kind: str):
+        if not term:
+            return
+        with self._lock:
+            self._insert_locked(term, kind)
+
+    def remove(self, term: Optional[str], kind: str):
+        if not term:
+            return
+        with self._lock:
+            self._release_locked(_key(term, kind))
+
+    def rename(self, old: Optional[str], new: Optional[str], kind: str):
+        if old != new:
+            self.remove(old, kind)
+            self.add(new, kind)
+
+    def set_product(self, product_id: int, name: Optional[str], is_active: Optional[bool] = True):
+        """Index a product under its current name; an inactive one is dropped (NULL counts as active)."""
+        if is_active is False or not name:
+            self.remove_product(product_id)
+            return
+        key = _key(name, PRODUCT)
+        with self._lock:
+            old = self._products.get(product_id)
+            if old == key:
+                return
+            if old is not None:
+                self._release_locked(old)
+            self._products[product_id] = key
+            self._insert_locked(name, PRODUCT)
+
+    def remove_product(self, product_id: int):
+        with self._lock:
+            key = self._products.pop(product_id, None)
+            if key is not None:
+                self._release_locked(key)
+
+    def record_query(self, q: str):
+        """Count a search that returned results so it can be suggested later."""
+        key = _key(q, QUERY)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry["weight"] += 1
+                self._rank_locked(key)
+                return
+            if self._query_count >= MAX_QUERIES:
+                return
+            self._entries[key] = {"term": q.strip(), "type": QUERY, "weight": 1.0, "refs": 1}
+            self._query_count += 1
+            bisect.insort(self._keys, key)
+            self._rank_locked(key)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[dict]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                block = self._range(prefix)
+                if block.stop - block.start > SCAN_LIMIT:
+                    top = self._fill_locked(prefix)
+            candidates = top[:limit] if top is not None else self._keys[block]
+            entries = self._entries
+
+        # Ranked outside the lock; an entry removed meanwhile is skipped
+        ranked = heapq.nlargest(
+            limit,
+            (e for e in map(entries.get, candidates) if e is not None),
+            key=lambda e: e["weight"],
+        )
+        return [{"term": e["term"], "type": e["type"]} for e in ranked]
+
+    def _range(self, prefix: str) -> slice:
+        lo = bisect.bisect_left(self._keys, prefix)
+        return slice(lo, bisect.bisect_left(self._keys, prefix + "\uffff", lo))
+
+    def _order(self, key: str):
+        # Highest weight first, then alphabetical
+        return (-self._entries[key]["weight"], key)
+
+    def _prefixes_locked(self, key: str) -> List[str]:
+        # The prefixes of key's term that have a top list
+        term = key.split("\x00", 1)[0]
+        return [term[:n] for n in range(1, len(term) + 1) if term[:n] in self._top]
+
+    def _rank_locked(self, key: str):
+        # key was added or gained weight: move it into the top lists it now belongs to
+        for prefix in self._prefixes_locked(key):
+            top = self._top[prefix]
+            if key not in top:
+                # A cut list only takes keys that beat its last one; keys it dropped may rank in between
+                if prefix in self._cut and self._order(key) >= self._order(top[-1]):
+                    continue
+                top.append(key)
+            top.sort(key=self._order)
+            if len(top) > TOP_KEEP:
+                del top[TOP_KEEP:]
+                self._cut.add(prefix)
+
+    def _fill_locked(self, prefix: str) -> List[str]:
+        # Rank the prefix's whole block; the one step that is not bounded by SCAN_LIMIT
+        block = self._keys[self._range(prefix)]
+        top = self._top[prefix] = heapq.nsmallest(TOP_KEEP, block, key=self._order)
+        if len(block) > TOP_KEEP:
+            self._cut.add(prefix)
+        else:
+            self._cut.discard(prefix)
+        return top
+
+    def _insert_locked(self, term: str, kind: str):
+        key = self._add_locked(term, kind)
+        if key is not None:
+            bisect.insort(self._keys, key)
+            self._rank_locked(key)
+
+    def _release_locked(self, key: str):
+        # One holder of key let go; the last one takes it out of the index
+        entry = self._entries.get(key)
+        if not entry:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] > 0:
+            return
+        del self._entries[key]
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+        for prefix in self._prefixes_locked(key):
+            top = self._top[prefix]
+            if key in top:
+                top.remove(key)
+                if len(top) < TOP_N and prefix in self._cut:
+                    self._fill_locked(prefix)
+                elif not top:
+                    del self._top[prefix]
+
+    def _add_locked(self, term: str, kind: str) -> Optional[str]:
+        # Returns the key when it is new and still has to be placed in self._keys
+        key = _key(term, kind)
+        entry = self._entries.get(key)
+        if entry:
+            entry["refs"] += 1
+            return None
+        self._entries[key] = {"term": term, "type": kind, "weight": BASE_WEIGHTS[kind], "refs": 1}
+        return key
+
+
+def _key(term: str, kind: str) -> str:
+    return f"{normalize(term)}\x00{kind}"
+
+
+index = PrefixIndex()
@@ -0,0 +1,123 @@
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import crud
+import models
+from database import SessionLocal
+
+# bench_checkout.py
+# Concurrency stress test for crud.checkout_cart: --buyers users, each with
+# one unit of the same product in their cart, check out in parallel against
+# --stock units. Asserts that exactly min(stock, buyers) orders succeed, that
+# stock ends at stock - sold and never below zero, and that order items match
+# the units sold. Prints checkout throughput. Creates its own rows and deletes
+# them afterwards; point DATABASE_URL at a scratch database anyway.
+#
+#     python bench_checkout.py
+#     python bench_checkout.py --buyers 500 --stock 120 --workers 12
+
+
+def setup(buyers: int, stock: int, tag: str):
+    db = SessionLocal()
+    try:
+        product = models.Product(name=f"bench-{tag}", price=100.0, stock=stock)
+        users = [
+            models.User(username=f"bench-{tag}-{i}", email=f"bench-{tag}-{i}@example.com", hashed_password="x")
+            for i in range(buyers)
+        ]
+        db.add(product)
+        db.add_all(users)
+        db.flush()
+        addresses = [
+            models.Address(user_id=u.id, address_line="1 Bench Rd", city="Lagos", state="Lagos",
+                           country="NG", postal_code="100001", phone_number="0")
+            for u in users
+        ]
+        carts = [models.Cart(user_id=u.id, subtotal=100.0, item_count=1) for u in users]
+        db.add_all(addresses + carts)
+        db.flush()
+        db.add_all([
+            models.CartItem(cart_id=c.id, product_id=product.id, quantity=1, price_at_addition=100.0) for c in carts
+        ])
+        db.commit()
+        return product.id, [(u.id, a.id) for u, a in zip(users, addresses)]
+    finally:
+        db.close()
+
+
+def checkout(buyer):
+    user_id, address_id = buyer
+    db = SessionLocal()
+    try:
+        crud.checkout_cart(db, user_id, address_id)
+        return "ok"
+    except HTTPException as e:
+        return "sold out" if e.status_code == 400 else f"http {e.status_code}"
+    except Exception as e:  # deadlocks etc. count as failures of the test
+        return f"error {type(e).__name__}"
+    finally:
+        db.close()
+
+
+def teardown(product_id: int, buyers: list):
+    db = SessionLocal()
+    try:
+        user_ids = [user_id for user_id, _ in buyers]
+        order_ids = [o for (o,) in db.query(models.Order.id).filter(models.Order.user_id.in_(user_ids))]
+        db.query(models.OrderItem).filter(models.OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(models.Order).filter(models.Order.id.in_(order_ids)).delete(synchronize_session=False)
+        cart_ids = [c for (c,) in db.query(models.Cart.id).filter(models.Cart.user_id.in_(user_ids))]
+        db.query(models.CartItem).filter(models.CartItem.cart_id.in_(cart_ids)).delete(synchronize_session=False)
+        db.query(models.Cart).filter(models.Cart.id.in_(cart_ids)).delete(synchronize_session=False)
+        db.query(models.Address).filter(models.Address.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.query(models.User).filter(models.User.id.in_(user_ids)).delete(synchronize_session=False)
+        db.query(models.Product).filter(models.Product.id == product_id).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel checkouts of one SKU")
+    parser.add_argument("--buyers", type=int, default=200, help="users checking out one unit each")
+    parser.add_argument("--stock", type=int, default=50, help="units of the product in stock")
+    parser.add_argument("--workers", type=int, default=12, help="concurrent checkouts (keep under the DB pool size)")
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:8]
+    product_id, buyers = setup(args.buyers, args.stock, tag)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(checkout, buyers))
+        seconds = time.perf_counter() - started
+
+        db = SessionLocal()
+        try:
+            stock = db.query(models.Product.stock).filter(models.Product.id == product_id).scalar()
+            units = db.query(models.OrderItem.quantity).filter(models.OrderItem.product_id == product_id).all()
+        finally:
+            db.close()
+
+        sold = results.count("ok")
+        errors = [r for r in results if r not in ("ok", "sold out")]
+        expected = min(args.stock, args.buyers)
+        print(f"{args.buyers} checkouts with {args.workers} workers in {seconds:.2f}s "
+              f"({args.buyers / seconds:.0f} checkouts/s)")
+        print(f"sold {sold}, sold out {results.count('sold out')}, errors {len(errors)}, stock left {stock}")
+
+        assert not errors, f"unexpected failures: {sorted(set(errors))}"
+        assert sold == expected, f"sold {sold}, expected {expected}"
+        assert stock == args.stock - sold and stock >= 0, f"stock {stock} after selling {sold} of {args.stock}"
+        assert sum(q for (q,) in units) == sold, "order items do not match the units sold"
+        print("OK: no oversell")
+    finally:
+        teardown(product_id, buyers)
+
+
+if __name__ == "__main__":
+    main()
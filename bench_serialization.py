@@ -0,0 +1,78 @@
+import argparse
+import timeit
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import models
+import schemas
+import serialization
+
+# bench_serialization.py
+# Per-request serialization cost of a /products/ and an /orders/user page:
+# the old path (dict of ORM objects → jsonable_encoder → JSONResponse) against
+# the new one (serialization.envelope: cached TypeAdapter → orjson).
+# No database needed; rows are built in memory.
+#
+#     python bench_serialization.py
+#     python bench_serialization.py --rows 100 --number 2000
+
+
+def make_products(n: int):
+    return [
+        models.Product(
+            id=i, name=f"Product {i}", description="Lorem ipsum dolor sit amet, " * 8,
+            price=1999.0 + i, stock=i % 50, image_url=f"static/media/ab/{i:064x}.jpg",
+            thumbnail_url=f"static/media/ab/{i:064x}/thumb.jpg", image_status="ready",
+            image_variants={"webp": {"200w": "a.webp", "400w": "b.webp"}, "avif": {"200w": "a.avif"}},
+            image_hash=f"{i:064x}", category_id=i % 7, created_at=datetime(2025, 1, 1, 12, 0, i % 60),
+            is_active=True, sales_count=i * 3, view_count=i * 11,
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+def make_orders(n: int):
+    return [
+        models.Order(
+            id=i, order_reference=f"ORD-{i:08X}", user_id=1, address_id=1, status="pending",
+            payment_method="paystack", payment_status="pending", payment_option_id=None,
+            total_amount=15000.0 + i, discount_amount=0.0, created_at=datetime(2025, 1, 1),
+            shipped_at=None, delivered_at=None,
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+def old_path(data):
+    return JSONResponse(jsonable_encoder({"success": True, "message": "ok", "data": data})).body
+
+
+def new_path(data, schema):
+    return serialization.envelope(data, "ok", schema=schema).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization microbenchmark")
+    parser.add_argument("--rows", type=int, default=20, help="rows per page (the /products/ default is 20)")
+    parser.add_argument("--number", type=int, default=1000, help="requests to time per path")
+    args = parser.parse_args()
+
+    cases = [
+        ("/products/", make_products(args.rows), schemas.ProductOut),
+        ("/orders/user", make_orders(args.rows), schemas.OrderOut),
+    ]
+    print(f"{args.rows} rows per response, best of 5 × {args.number} runs")
+    for name, rows, schema in cases:
+        new_path(rows, schema)  # builds and caches the TypeAdapter
+        old = min(timeit.repeat(lambda: old_path(rows), number=args.number, repeat=5)) / args.number
+        new = min(timeit.repeat(lambda: new_path(rows, schema), number=args.number, repeat=5)) / args.number
+        print(
+            f"{name:<14} jsonable_encoder: {old * 1e6:8.1f} µs   "
+            f"TypeAdapter+orjson: {new * 1e6:8.1f} µs   ({old / new:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
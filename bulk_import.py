@@ -0,0 +1,247 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from typing import IO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import autocomplete
+import category_stats
+import crud
+import media_server
+import models
+import schemas
+from database import SessionLocal
+from response_cache import catalog_cache
+
+# bulk_import.py
+# Streaming product import for supplier feeds (CSV or NDJSON).
+# Rows are read one at a time, validated against schemas.ProductCreate and
+# written in batches: one SELECT to find which names already exist, one
+# multi-row INSERT for the new products and one executemany UPDATE for the
+# rest. products.name is not unique, so batches from concurrent imports (file
+# or remote) take a shared advisory lock and run one at a time; otherwise two
+# of them could both miss a name and insert it twice. Used by
+# POST /products/import and as a CLI:
+#
+#     python bulk_import.py feed.csv
+#     python bulk_import.py feed.ndjson --batch-size 2000
+
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "ndjson")
+PRODUCT_FIELDS = ("name", "description", "price", "stock", "image_url", "thumbnail_url", "category_id")
+IMPORT_LOCK = 0x62756C6B5F696D70  # pg_advisory_xact_lock key ("bulk_imp") held by each batch until it commits
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return None
+
+
+def iter_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (line number, row) without reading the whole stream into memory."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+
+
+class CategoryResolver:
+    """Maps a row's category (id or name) to an id, loading the category table once."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.by_name = {name.lower(): id_ for id_, name in db.query(models.Category.id, models.Category.name).all()}
+        self.ids = set(self.by_name.values())
+        self.created = 0
+
+    def resolve(self, row: dict) -> Optional[int]:
+        category_id = row.get("category_id")
+        if category_id not in (None, ""):
+            category_id = int(category_id)
+            if category_id not in self.ids:
+                raise ValueError(f"Unknown category_id {category_id}")
+            return category_id
+
+        name = (row.get("category") or "").strip()
+        if not name:
+            raise ValueError("Row needs a category_id or category name")
+        if name.lower() not in self.by_name:
+            self.by_name[name.lower()] = self._create(name)
+        return self.by_name[name.lower()]
+
+    def _create(self, name: str) -> int:
+        # Idempotent against a concurrent import creating the same category
+        stmt = (
+            pg_insert(models.Category)
+            .values(name=name, description=f"Auto-imported {name}")
+            .on_conflict_do_update(index_elements=[models.Category.name], set_={"name": name})
+            .returning(models.Category.id)
+        )
+        category_id = self.db.execute(stmt).scalar_one()
+        crud.link_category(self.db, category_id, None)
+        self.db.commit()
+        self.ids.add(category_id)
+        self.created += 1
+        catalog_cache.invalidate("categories")
+        autocomplete.index.add(name, autocomplete.CATEGORY)
+        return category_id
+
+
+def validate_row(row: object, categories: CategoryResolver) -> dict:
+    if isinstance(row, Exception):
+        raise ValueError(f"Invalid JSON: {row}")
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    # Empty cells mean "not supplied", so an update never blanks existing columns
+    data = {key: value for key, value in row.items() if key in PRODUCT_FIELDS and value not in ("", None)}
+    data["category_id"] = categories.resolve(row)
+    return schemas.ProductCreate(**data).model_dump(exclude_unset=True)
+
+
+def upsert_batch(db: Session, rows: List[dict]) -> Tuple[int, int]:
+    """Insert new products and update existing ones (matched by name). Returns (inserted, updated)."""
+    # Held until the commit below, so the next batch's SELECT sees this one's inserts
+    db.execute(select(func.pg_advisory_xact_lock(IMPORT_LOCK)))
+    by_name = {row["name"]: row for row in rows}  # last occurrence of a name wins
+    existing = {}
+    touched_categories = {row["category_id"] for row in rows}
+    for id_, name, category_id in (
+        db.query(models.Product.id, models.Product.name, models.Product.category_id)
+        .filter(models.Product.name.in_(list(by_name)))
+        .order_by(models.Product.id)
+    ):
+        existing.setdefault(name, id_)
+        touched_categories.add(category_id)
+
+    new_rows = [row for name, row in by_name.items() if name not in existing]
+    changed_rows = [{"id": existing[name], **row} for name, row in by_name.items() if name in existing]
+
+    inserted = []
+    if new_rows:
+        inserted = db.execute(insert(models.Product).returning(models.Product.id, models.Product.name), new_rows).all()
+    if changed_rows:
+        db.execute(update(models.Product), changed_rows)
+    # One grouped recompute per batch is cheaper than per-row deltas here
+    category_stats.refresh(db, touched_categories)
+    db.commit()
+
+    for product_id, name in inserted:
+        autocomplete.index.set_product(product_id, name)
+    media_server.product_media.forget(*[row["id"] for row in changed_rows])
+    catalog_cache.invalidate("products", *[f"product:{row['id']}" for row in changed_rows], "categories")
+    return len(new_rows), len(changed_rows)
+
+
+def import_products(db: Session, stream: IO[bytes], fmt: str, batch_size: int = BATCH_SIZE, on_batch=None) -> dict:
+    """Stream `stream` into products. Row-level problems are reported, not raised."""
+    report = {
+        "format": fmt,
+        "rows": 0,
+        "inserted": 0,
+        "updated": 0,
+        "failed": 0,
+        "categories_created": 0,
+        "batches": [],
+        "errors": [],
+        "errors_truncated": False,
+    }
+    categories = CategoryResolver(db)
+    started = time.perf_counter()
+    batch: List[dict] = []
+
+    def flush():
+        batch_started = time.perf_counter()
+        inserted, updated = upsert_batch(db, batch)
+        seconds = time.perf_counter() - batch_started
+        stats = {
+            "batch": len(report["batches"]) + 1,
+            "rows": len(batch),
+            "inserted": inserted,
+            "updated": updated,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(len(batch) / seconds) if seconds else None,
+        }
+        report["batches"].append(stats)
+        report["inserted"] += inserted
+        report["updated"] += updated
+        batch.clear()
+        if on_batch:
+            on_batch(stats)
+
+    for line_no, row in iter_rows(stream, fmt):
+        report["rows"] += 1
+        try:
+            batch.append(validate_row(row, categories))
+        except (ValueError, TypeError, ValidationError) as e:
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                detail = e.errors(include_url=False, include_context=False) if isinstance(e, ValidationError) else str(e)
+                report["errors"].append({"line": line_no, "error": detail})
+            else:
+                report["errors_truncated"] = True
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    report["categories_created"] = categories.created
+    report["seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products from a CSV or NDJSON file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if not fmt:
+        parser.error("Cannot tell the format from the extension; pass --format")
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            report = import_products(
+                db, f, fmt, args.batch_size,
+                on_batch=lambda b: print(
+                    f"batch {b['batch']}: {b['rows']} rows ({b['inserted']} new, {b['updated']} updated) "
+                    f"in {b['seconds']}s → {b['rows_per_second']} rows/s"
+                ),
+            )
+    finally:
+        db.close()
+
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    print(
+        f"✅ {report['inserted']} inserted, {report['updated']} updated, {report['failed']} failed "
+        f"out of {report['rows']} rows in {report['seconds']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import crud
+import models
+import scheduler
+import schemas
+from database import SessionLocal
+
+# cart_store.py
+# Where live carts are kept. CART_STORE=db (default) reads and writes
+# carts/cart_items on every request through crud.py. CART_STORE=redis keeps
+# each user's cart in a Redis hash and writes it behind to Postgres: a
+# scheduled flusher persists changed carts in batches (one DELETE and one
+# INSERT ... ON CONFLICT per batch) and a cart missing from Redis is reloaded
+# from Postgres. Checkout syncs the user's cart first, so crud.checkout_cart
+# and crud.format_cart work on the same rows/objects either way, and afterwards
+# removes only the lines the order consumed, so a change that arrives mid-checkout
+# survives.
+#
+# Redis layout, per user: hash cart:<user_id> with cart_id, created_at and, for
+# each product in the cart, q:<product_id> (quantity), i:<product_id> (the
+# cart_items id) and p:<product_id> (price snapshot). Users with unflushed
+# changes are in the set carts:dirty. Item ids are real cart_items ids, taken
+# from a pool reserved from the table's sequence, so clients can address items
+# before they reach Postgres.
+
+CART_STORE = os.getenv("CART_STORE", "db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CART_TTL = int(os.getenv("CART_TTL", str(7 * 24 * 3600)))  # idle carts drop out of Redis (they are in Postgres)
+CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "5"))
+CART_FLUSH_BATCH = 500
+ITEM_ID_BATCH = 1000
+
+
+class CartStore(ABC):
+    # sync/checked_out/flush only matter to backends that cache carts outside Postgres
+
+    @abstractmethod
+    def get_cart(self, db: Session, user_id: int) -> models.Cart:
+        """The user's cart with .items and each item's .product, created if missing."""
+
+    @abstractmethod
+    def add_items(self, db: Session, user_id: int, items: List[schemas.CartItemCreate]) -> List[models.CartItem]:
+        """Add quantities, merging lines of the same product; one item per distinct product comes back. 404 if a product does not exist."""
+
+    @abstractmethod
+    def update_item(self, db: Session, user_id: int, item_id: int, item: schemas.CartItemUpdate) -> Optional[models.CartItem]:
+        """None if the item is not in the user's cart or the new quantity removed it."""
+
+    @abstractmethod
+    def remove_item(self, db: Session, user_id: int, item_id: int) -> Optional[models.CartItem]:
+        """The removed item, or None if it is not in the user's cart."""
+
+    @abstractmethod
+    def clear(self, db: Session, user_id: int) -> bool:
+        """False if the user has no cart."""
+
+    def sync(self, db: Session, user_id: int):
+        """Make the user's cart in Postgres current (before checkout reads it)."""
+
+    def checked_out(self, user_id: int, lines: List[models.OrderItem]):
+        """Checkout emptied the cart in Postgres: drop the lines it consumed from any cached copy."""
+
+    def flush(self, db: Session) -> int:
+        """Persist pending changes; returns the number of carts written."""
+        return 0
+
+
+# -------------------------------
+# Postgres (default)
+# -------------------------------
+class DatabaseCartStore(CartStore):
+    def get_cart(self, db, user_id):
+        return crud.load_cart(db, user_id) or crud.create_cart(db, schemas.CartCreate(user_id=user_id))
+
+    def add_items(self, db, user_id, items):
+        db_cart = crud.get_cart(db, user_id) or crud.create_cart(db, schemas.CartCreate(user_id=user_id))
+        return crud.add_cart_items(db, db_cart.id, items)
+
+    def _owns(self, db, user_id, item_id) -> bool:
+        return db.query(models.CartItem.id).join(models.Cart).filter(
+            models.CartItem.id == item_id, models.Cart.user_id == user_id
+        ).first() is not None
+
+    def update_item(self, db, user_id, item_id, item):
+        return crud.update_cart_item(db, item_id, item) if self._owns(db, user_id, item_id) else None
+
+    def remove_item(self, db, user_id, item_id):
+        return crud.remove_cart_item(db, item_id) if self._owns(db, user_id, item_id) else None
+
+    def clear(self, db, user_id):
+        db_cart = crud.get_cart(db, user_id)
+        if not db_cart:
+            return False
+        crud.clear_cart(db, db_cart.id)
+        return True
+
+
+# -------------------------------
+# Redis with write-behind
+# -------------------------------
+class RedisCartStore(CartStore):
+    DIRTY = "carts:dirty"
+    ID_POOL = "carts:item_ids"
+
+    def __init__(self, client=None):
+        if client is None:
+            import redis  # only needed with CART_STORE=redis
+
+            client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        self.redis = client
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    def _load(self, db: Session, user_id: int) -> str:
+        """Make sure the user's cart is in Redis, reading it from Postgres on a miss."""
+        from redis import WatchError
+
+        key = self.key(user_id)
+        if self.redis.exists(key):
+            return key
+
+        db_cart = crud.get_cart(db, user_id) or crud.create_cart(db, schemas.CartCreate(user_id=user_id))
+        mapping = {"cart_id": db_cart.id, "created_at": db_cart.created_at.isoformat()}
+        for item in db_cart.items:
+            mapping[f"q:{item.product_id}"] = item.quantity
+            mapping[f"i:{item.product_id}"] = item.id
+            mapping[f"p:{item.product_id}"] = item.price_at_addition
+
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if not pipe.exists(key):
+                    pipe.multi()
+                    pipe.hset(key, mapping=mapping)
+                    pipe.expire(key, CART_TTL)
+                    pipe.execute()
+            except WatchError:
+                pass  # a concurrent request loaded (and maybe already changed) it
+        return key
+
+    def _next_item_id(self, db: Session) -> int:
+        item_id = self.redis.lpop(self.ID_POOL)
+        if item_id is None:
+            ids = db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('cart_items', 'id')) FROM generate_series(1, :n)"),
+                {"n": ITEM_ID_BATCH},
+            ).scalars().all()
+            item_id, spare = ids[0], ids[1:]
+            self.redis.rpush(self.ID_POOL, *spare)
+        return int(item_id)
+
+    def _touch(self, pipe, key: str, user_id: int):
+        # Data first, then the dirty mark: a flusher that already took this
+        # user out of the set will see the mark again and re-flush
+        pipe.expire(key, CART_TTL)
+        pipe.sadd(self.DIRTY, user_id)
+
+    @staticmethod
+    def _items(fields: dict) -> List[models.CartItem]:
+        cart_id = int(fields["cart_id"])
+        items = []
+        for name, quantity in fields.items():
+            pid = name[2:]
+            # A line half-removed by a racing request (quantity without id/price) is skipped
+            if name.startswith("q:") and f"i:{pid}" in fields and f"p:{pid}" in fields:
+                items.append(models.CartItem(
+                    id=int(fields[f"i:{pid}"]),
+                    cart_id=cart_id,
+                    product_id=int(pid),
+                    quantity=int(quantity),
+                    price_at_addition=float(fields[f"p:{pid}"]),
+                ))
+        return items
+
+    def _find(self, db: Session, user_id: int, item_id: int):
+        key = self._load(db, user_id)
+        fields = self.redis.hgetall(key)
+        item = next((i for i in self._items(fields) if i.id == item_id), None)
+        return key, item
+
+    def get_cart(self, db, user_id):
+        fields = self.redis.hgetall(self._load(db, user_id))
+        items = self._items(fields)
+        products = {
+            p.id: p
+            for p in db.query(models.Product).filter(models.Product.id.in_([i.product_id for i in items]))
+        } if items else {}
+        for item in items:
+            item.product = products.get(item.product_id)
+        # Detached stand-ins for the rows format_cart/checkout expect; never added to the session
+        return models.Cart(
+            id=int(fields["cart_id"]),
+            user_id=user_id,
+            created_at=datetime.fromisoformat(fields["created_at"]),
+            items=sorted(items, key=lambda i: i.id),
+            subtotal=sum(i.price_at_addition * i.quantity for i in items),
+            item_count=sum(i.quantity for i in items),
+        )
+
+    def add_items(self, db, user_id, items):
+        prices = dict(
+            db.query(models.Product.id, models.Product.price)
+            .filter(models.Product.id.in_([item.product_id for item in items]))
+            .all()
+        )
+        missing = [str(pid) for pid in dict.fromkeys(item.product_id for item in items) if pid not in prices]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Product not found: {', '.join(missing)}")
+
+        key = self._load(db, user_id)
+        known = dict(zip(
+            [item.product_id for item in items],
+            self.redis.hmget(key, [f"i:{item.product_id}" for item in items]) if items else [],
+        ))
+        pipe = self.redis.pipeline()
+        for item in items:
+            pid = item.product_id
+            if known.get(pid) is None:
+                known[pid] = self._next_item_id(db)
+                # HSETNX: if a concurrent add got here first, its id and price stand
+                pipe.hsetnx(key, f"i:{pid}", known[pid])
+                pipe.hsetnx(key, f"p:{pid}", prices[pid])
+            pipe.hincrby(key, f"q:{pid}", item.quantity)
+        self._touch(pipe, key, user_id)
+        pipe.execute()
+
+        by_product = {i.product_id: i for i in self._items(self.redis.hgetall(key))}
+        return [by_product[pid] for pid in dict.fromkeys(item.product_id for item in items)]
+
+    def update_item(self, db, user_id, item_id, item):
+        key, cart_item = self._find(db, user_id, item_id)
+        if cart_item is None:
+            return None
+        if item.quantity is None:
+            return cart_item
+
+        pid = cart_item.product_id
+        pipe = self.redis.pipeline()
+        if item.quantity <= 0:
+            pipe.hdel(key, f"q:{pid}", f"i:{pid}", f"p:{pid}")
+        else:
+            pipe.hset(key, f"q:{pid}", item.quantity)
+        self._touch(pipe, key, user_id)
+        pipe.execute()
+        if item.quantity <= 0:
+            return None
+        cart_item.quantity = item.quantity
+        return cart_item
+
+    def remove_item(self, db, user_id, item_id):
+        key, cart_item = self._find(db, user_id, item_id)
+        if cart_item is None:
+            return None
+        pid = cart_item.product_id
+        pipe = self.redis.pipeline()
+        pipe.hdel(key, f"q:{pid}", f"i:{pid}", f"p:{pid}")
+        self._touch(pipe, key, user_id)
+        pipe.execute()
+        return cart_item
+
+    def clear(self, db, user_id):
+        key = self._load(db, user_id)
+        lines = [name for name in self.redis.hkeys(key) if name[:2] in ("q:", "i:", "p:")]
+        pipe = self.redis.pipeline()
+        if lines:
+            pipe.hdel(key, *lines)
+        self._touch(pipe, key, user_id)
+        pipe.execute()
+        return True
+
+    def _write(self, db: Session, user_ids: List[int]) -> int:
+        """Replace the cart_items of these users' carts with what Redis holds."""
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hgetall(self.key(user_id))
+        carts = [fields for fields in pipe.execute() if fields.get("cart_id")]  # expired carts have nothing to write
+        if not carts:
+            return 0
+
+        rows = [
+            {"id": i.id, "cart_id": i.cart_id, "product_id": i.product_id,
+             "quantity": i.quantity, "price_at_addition": i.price_at_addition}
+            for fields in carts for i in self._items(fields)
+        ]
+        # Lines for products deleted since they were added are dropped, not written
+        existing = set(db.execute(
+            select(models.Product.id).where(models.Product.id.in_({row["product_id"] for row in rows}))
+        ).scalars()) if rows else set()
+        rows = [row for row in rows if row["product_id"] in existing]
+
+        table = models.CartItem.__table__
+        db.execute(delete(table).where(
+            table.c.cart_id.in_([int(fields["cart_id"]) for fields in carts]),
+            table.c.id.not_in([row["id"] for row in rows]),
+        ))
+        if rows:
+            stmt = pg_insert(table).values(rows)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.id], set_={"quantity": stmt.excluded.quantity}
+            ))
+        crud.refresh_cart_totals(db, [int(fields["cart_id"]) for fields in carts])
+        return len(carts)
+
+    def sync(self, db, user_id):
+        if not self.redis.srem(self.DIRTY, user_id):
+            return
+        try:
+            self._write(db, [user_id])
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.redis.sadd(self.DIRTY, user_id)
+            raise
+
+    def checked_out(self, user_id, lines):
+        # Only what checkout bought goes: a line added after sync() was not in the
+        # order and stays, a quantity raised since keeps the difference. Deleting
+        # the whole hash here would silently lose such changes.
+        from redis import WatchError
+
+        bought = {}
+        for line in lines:
+            bought[line.product_id] = bought.get(line.product_id, 0) + line.quantity
+        key = self.key(user_id)
+        while True:
+            with self.redis.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    fields = pipe.hgetall(key)
+                    if not fields:
+                        return  # expired; Postgres holds the cart
+                    pipe.multi()
+                    for pid, quantity in bought.items():
+                        left = int(fields.get(f"q:{pid}") or 0) - quantity
+                        if left > 0:
+                            pipe.hset(key, f"q:{pid}", left)
+                        else:
+                            pipe.hdel(key, f"q:{pid}", f"i:{pid}", f"p:{pid}")
+                    # Dirty even when empty, so Postgres ends up matching whatever is left
+                    self._touch(pipe, key, user_id)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue  # the cart changed under us; recompute
+
+    def flush(self, db):
+        written = 0
+        while True:
+            user_ids = [int(uid) for uid in self.redis.spop(self.DIRTY, CART_FLUSH_BATCH) or []]
+            if not user_ids:
+                return written
+            try:
+                written += self._write(db, user_ids)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Put them back so the next flush retries them
+                self.redis.sadd(self.DIRTY, *user_ids)
+                raise
+
+
+def create_store() -> CartStore:
+    if CART_STORE == "db":
+        return DatabaseCartStore()
+    if CART_STORE == "redis":
+        return RedisCartStore()
+    raise RuntimeError(f"Unknown CART_STORE {CART_STORE!r} (expected db or redis)")
+
+
+store = create_store()
+
+
+@scheduler.every(CART_FLUSH_INTERVAL, run_on_shutdown=True)
+def flush_job():
+    db = SessionLocal()
+    try:
+        store.flush(db)
+    finally:
+        db.close()
@@ -0,0 +1,149 @@
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import models
+import scheduler
+from database import SessionLocal
+from response_cache import catalog_cache
+
+# category_stats.py
+# Per-category aggregates for the navigation badges ("Phones (1,243) · ₦5k–₦900k"):
+# active product count, in-stock count and price bounds, stored in category_stats.
+# Product writes in crud.py hand their before/after snapshots to record_changes()
+# inside the same transaction: counts move by deltas and bounds only widen, except
+# when the product holding a bound leaves, which recomputes that category's
+# bounds. A scheduled job rebuilds the table from products to correct any drift
+# left by concurrent writers.
+
+RECONCILE_INTERVAL = float(os.getenv("CATEGORY_STATS_RECONCILE_INTERVAL", "900"))
+
+# (category_id, active, stock, price) — what a product contributes to its category
+Snapshot = Tuple[Optional[int], bool, int, float]
+
+stats = models.CategoryStats.__table__
+products = models.Product.__table__
+is_active = products.c.is_active.isnot(False)  # NULL (pre-flag rows) counts as active
+
+
+def snapshot(product: models.Product) -> Snapshot:
+    return (product.category_id, product.is_active is not False, product.stock or 0, product.price)
+
+
+def record_changes(db: Session, changes: Iterable[Tuple[Optional[Snapshot], Optional[Snapshot]]]):
+    """
+    Apply (before, after) product snapshots to category_stats; None means the
+    product did not exist before / no longer exists. Call after the product rows
+    are flushed and before the commit; invalidate the "categories" cache after it.
+    """
+    counts = defaultdict(lambda: [0, 0])
+    added, removed = defaultdict(Counter), defaultdict(Counter)
+    for before, after in changes:
+        if before == after:
+            continue
+        for snap, sign, prices in ((before, -1, removed), (after, 1, added)):
+            if snap is None:
+                continue
+            category_id, active, stock, price = snap
+            if category_id is None or not active:
+                continue
+            counts[category_id][0] += sign
+            counts[category_id][1] += sign * (stock > 0)
+            prices[category_id][price] += 1
+    if not counts:
+        return
+
+    now = datetime.utcnow()
+    for category_id, (count, in_stock) in counts.items():
+        # A price that left and came back (e.g. a stock-only change) cannot move a bound
+        net_added = added[category_id] - removed[category_id]
+        removed[category_id] -= added[category_id]
+        lo = min(net_added) if net_added else None
+        hi = max(net_added) if net_added else None
+        if not (count or in_stock or net_added or removed[category_id]):
+            continue
+        stmt = pg_insert(stats).values(
+            category_id=category_id, product_count=count, in_stock_count=in_stock,
+            min_price=lo, max_price=hi, updated_at=now,
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[stats.c.category_id],
+            set_={
+                "product_count": stats.c.product_count + count,
+                "in_stock_count": stats.c.in_stock_count + in_stock,
+                # LEAST/GREATEST skip NULLs, so an empty category takes the new price
+                "min_price": func.least(stats.c.min_price, lo),
+                "max_price": func.greatest(stats.c.max_price, hi),
+                "updated_at": now,
+            },
+        ))
+
+    # Recompute bounds only where a removed price was the min or max
+    for category_id, gone in removed.items():
+        if not gone:
+            continue
+        in_category = (products.c.category_id == category_id) & is_active
+        db.execute(
+            update(stats)
+            .where(
+                stats.c.category_id == category_id,
+                or_(stats.c.min_price >= min(gone), stats.c.max_price <= max(gone)),
+            )
+            .values(
+                min_price=select(func.min(products.c.price)).where(in_category).scalar_subquery(),
+                max_price=select(func.max(products.c.price)).where(in_category).scalar_subquery(),
+            )
+        )
+
+
+def _aggregates():
+    return (
+        select(
+            products.c.category_id,
+            func.count().label("product_count"),
+            func.count().filter(products.c.stock > 0).label("in_stock_count"),
+            func.min(products.c.price).label("min_price"),
+            func.max(products.c.price).label("max_price"),
+            func.now().label("updated_at"),
+        )
+        .where(products.c.category_id.isnot(None), is_active)
+        .group_by(products.c.category_id)
+    )
+
+
+def refresh(db: Session, category_ids: Optional[Iterable[int]] = None):
+    """Recompute the given categories (all of them when None) from products."""
+    rows = _aggregates()
+    clear = delete(stats)
+    if category_ids is not None:
+        category_ids = list(set(category_ids) - {None})
+        if not category_ids:
+            return
+        rows = rows.where(products.c.category_id.in_(category_ids))
+        clear = clear.where(stats.c.category_id.in_(category_ids))
+
+    db.execute(clear)
+    db.execute(pg_insert(stats).from_select(
+        ["category_id", "product_count", "in_stock_count", "min_price", "max_price", "updated_at"], rows
+    ))
+
+
+def get_all(db: Session) -> dict:
+    """category_id → CategoryStats row."""
+    return {row.category_id: row for row in db.query(models.CategoryStats).all()}
+
+
+@scheduler.every(RECONCILE_INTERVAL)
+def reconcile_job():
+    db = SessionLocal()
+    try:
+        refresh(db)
+        db.commit()
+        catalog_cache.invalidate("categories")
+    finally:
+        db.close()
@@ -0,0 +1,139 @@
+import sys
+import uuid
+
+import fakeredis
+
+import cart_store
+import crud
+import models
+import schemas
+from database import SessionLocal
+
+# check_cart_store.py
+# Runs cart_store.RedisCartStore against fakeredis and a scratch Postgres:
+# add/merge, update, remove, reload after the Redis copy is gone, the
+# flusher's write-behind to cart_items, checkout (sync → checkout_cart →
+# checked_out) and an add that lands between sync and checkout, which must
+# survive. Creates its own user/products and deletes them afterwards; point
+# DATABASE_URL at a scratch database anyway. Needs fakeredis (pip install fakeredis).
+#
+#     python check_cart_store.py
+
+
+def setup(tag: str):
+    db = SessionLocal()
+    try:
+        user = models.User(username=f"chk-{tag}", email=f"chk-{tag}@example.com", hashed_password="x")
+        phone = models.Product(name=f"chk-{tag}-phone", price=100.0, stock=50)
+        case = models.Product(name=f"chk-{tag}-case", price=250.0, stock=50)
+        db.add_all([user, phone, case])
+        db.flush()
+        address = models.Address(user_id=user.id, address_line="1 Check Rd", city="Lagos", state="Lagos",
+                                 country="NG", postal_code="100001", phone_number="0")
+        db.add(address)
+        db.commit()
+        return user.id, address.id, phone.id, case.id
+    finally:
+        db.close()
+
+
+def postgres_lines(db, user_id: int) -> dict:
+    db.expire_all()
+    cart = crud.get_cart(db, user_id)
+    return {item.product_id: item.quantity for item in cart.items} if cart else {}
+
+
+def redis_lines(store, db, user_id: int) -> dict:
+    return {item.product_id: item.quantity for item in store.get_cart(db, user_id).items}
+
+
+def run(store, db, user_id: int, address_id: int, phone: int, case: int) -> list:
+    failures = []
+
+    def expect(ok, what):
+        print(f"{'ok  ' if ok else 'FAIL'}  {what}")
+        if not ok:
+            failures.append(what)
+
+    add = lambda *lines: store.add_items(db, user_id, [schemas.CartItemCreate(product_id=p, quantity=q) for p, q in lines])
+
+    # 1️⃣ Adds merge per product and stay in Redis until flushed
+    items = add((phone, 2), (case, 1), (phone, 1))
+    expect([(i.product_id, i.quantity) for i in items] == [(phone, 3), (case, 1)], "add merges lines of the same product")
+    expect(postgres_lines(db, user_id) == {} and store.redis.sismember(store.DIRTY, user_id), "adds are written behind (cart dirty)")
+
+    # 2️⃣ The flusher writes Redis to cart_items with the ids Redis handed out, and the totals
+    store.flush(db)
+    cart = crud.get_cart(db, user_id)
+    expect(postgres_lines(db, user_id) == {phone: 3, case: 1}, "flush writes the lines to Postgres")
+    expect(sorted(i.id for i in cart.items) == sorted(i.id for i in items), "flushed rows keep the Redis item ids")
+    expect((cart.subtotal, cart.item_count) == (550.0, 4), f"cart totals refreshed ({cart.subtotal}, {cart.item_count})")
+
+    # 3️⃣ Update and remove
+    by_product = {i.product_id: i for i in items}
+    store.update_item(db, user_id, by_product[case].id, schemas.CartItemUpdate(quantity=4))
+    expect(redis_lines(store, db, user_id) == {phone: 3, case: 4}, "update sets the quantity")
+    store.remove_item(db, user_id, by_product[phone].id)
+    expect(redis_lines(store, db, user_id) == {case: 4}, "remove drops the line")
+    expect(store.update_item(db, user_id, by_product[phone].id, schemas.CartItemUpdate(quantity=1)) is None,
+           "a removed item cannot be updated")
+
+    # 4️⃣ A cart missing from Redis is reloaded from Postgres
+    store.flush(db)
+    store.redis.delete(store.key(user_id))
+    expect(redis_lines(store, db, user_id) == {case: 4}, "reload from Postgres on a cache miss")
+
+    # 5️⃣ Checkout consumes the cart in both stores (what router_order.checkout_cart_route does)
+    store.sync(db, user_id)
+    order = crud.checkout_cart(db, user_id=user_id, address_id=address_id)
+    store.checked_out(user_id, order.items)
+    expect({i.product_id: i.quantity for i in order.items} == {case: 4}, "checkout orders what was in Redis")
+    store.flush(db)
+    expect(redis_lines(store, db, user_id) == {} and postgres_lines(db, user_id) == {}, "checkout empties the cart")
+
+    # 6️⃣ An add that lands after sync but before checked_out is kept, in Redis and then Postgres
+    add((phone, 2))
+    store.sync(db, user_id)
+    add((case, 1), (phone, 1))  # another tab, mid-checkout
+    order = crud.checkout_cart(db, user_id=user_id, address_id=address_id)
+    store.checked_out(user_id, order.items)
+    expect({i.product_id: i.quantity for i in order.items} == {phone: 2}, "checkout takes the synced lines")
+    expect(redis_lines(store, db, user_id) == {case: 1, phone: 1}, "changes made mid-checkout survive in Redis")
+    store.flush(db)
+    expect(postgres_lines(db, user_id) == {case: 1, phone: 1}, "and reach Postgres on the next flush")
+    return failures
+
+
+def teardown(user_id: int, product_ids: list):
+    db = SessionLocal()
+    try:
+        order_ids = [o for (o,) in db.query(models.Order.id).filter(models.Order.user_id == user_id)]
+        db.query(models.StockReservation).filter(models.StockReservation.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(models.OrderItem).filter(models.OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(models.Order).filter(models.Order.id.in_(order_ids)).delete(synchronize_session=False)
+        cart_ids = [c for (c,) in db.query(models.Cart.id).filter(models.Cart.user_id == user_id)]
+        db.query(models.CartItem).filter(models.CartItem.cart_id.in_(cart_ids)).delete(synchronize_session=False)
+        db.query(models.Cart).filter(models.Cart.id.in_(cart_ids)).delete(synchronize_session=False)
+        db.query(models.Address).filter(models.Address.user_id == user_id).delete(synchronize_session=False)
+        db.query(models.User).filter(models.User.id == user_id).delete(synchronize_session=False)
+        db.query(models.Product).filter(models.Product.id.in_(product_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    tag = uuid.uuid4().hex[:8]
+    user_id, address_id, phone, case = setup(tag)
+    store = cart_store.RedisCartStore(fakeredis.FakeRedis(decode_responses=True))
+    db = SessionLocal()
+    try:
+        failures = run(store, db, user_id, address_id, phone, case)
+    finally:
+        db.close()
+        teardown(user_id, [phone, case])
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
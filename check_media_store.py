@@ -0,0 +1,131 @@
+import argparse
+import hashlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import uuid
+
+import media_store
+import models
+from database import SessionLocal
+
+# check_media_store.py
+# Runs media_store's save → de-duplicate → reference count → collect cycle
+# through S3Backend against a local S3 stand-in: moto's server by default, or
+# MinIO (or any S3-compatible endpoint) with --endpoint-url and the usual AWS_*
+# credentials. Checks that identical bytes are stored once, that objects get
+# their content type and immutable Cache-Control, that a blob survives while
+# something references it, and that collect() removes the object and its
+# derived files. Uses a throwaway bucket and deletes its media_blobs row;
+# point DATABASE_URL at a scratch database anyway. Needs boto3 (and moto
+# without --endpoint-url).
+#
+#     python check_media_store.py
+#     python check_media_store.py --endpoint-url http://localhost:9000
+
+
+def start_moto():
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # one line per S3 request otherwise
+    # moto accepts any credentials; do not let it pick up real ones
+    for name, value in (("AWS_ACCESS_KEY_ID", "check"), ("AWS_SECRET_ACCESS_KEY", "check"), ("AWS_DEFAULT_REGION", "us-east-1")):
+        os.environ[name] = value
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    return server, f"http://{host}:{port}"
+
+
+def run(db, backend: media_store.S3Backend, data: bytes) -> list:
+    failures = []
+
+    def expect(ok, what):
+        print(f"{'ok  ' if ok else 'FAIL'}  {what}")
+        if not ok:
+            failures.append(what)
+
+    # 1️⃣ First upload stores the object, second one with the same bytes does not
+    blob, created = media_store.save_stream(db, io.BytesIO(data), "photo.JPG", "image/jpeg")
+    again, created_again = media_store.save_stream(db, io.BytesIO(data), "other-name.jpg", "image/jpeg")
+    blob_hash, key = blob.hash, blob.storage_key  # the row is deleted below
+    listed = backend.client.list_objects_v2(Bucket=backend.bucket).get("KeyCount", 0)
+    expect(created and not created_again and again.hash == blob.hash, "identical bytes are de-duplicated")
+    expect(backend.exists(key) and listed == 1, f"stored once under {key}")
+
+    head = backend.client.head_object(Bucket=backend.bucket, Key=key)
+    expect(head.get("ContentType") == "image/jpeg" and head.get("CacheControl") == media_store.IMMUTABLE_CACHE_CONTROL,
+           "content type and immutable Cache-Control set")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/blob"
+        backend.fetch(key, path)
+        with open(path, "rb") as f:
+            expect(f.read() == data, "fetch returns the stored bytes")
+    expect(backend.url(key) == f"{backend.endpoint_url}/{backend.bucket}/{key}",
+           "path-style URL for the stand-in")
+
+    # 2️⃣ Two products use it; the blob survives the first release
+    media_store.acquire(db, blob_hash)
+    media_store.acquire(db, blob_hash)
+    db.commit()
+    derived = media_store.derived_key(blob_hash, "thumb.webp")
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(b"thumb")
+    backend.put(derived, f.name, "image/webp")
+    db.query(models.MediaBlob).filter(models.MediaBlob.hash == blob_hash).update({"derived": {"keys": [derived]}})
+    db.commit()
+
+    media_store.release(db, blob_hash)
+    db.commit()
+    expect(not media_store.collect(db, blob_hash) and backend.exists(key), "a referenced blob is kept")
+
+    # 3️⃣ Last release: collect removes the row, the object and its derived files
+    media_store.release(db, blob_hash)
+    db.commit()
+    collected = media_store.collect(db, blob_hash)
+    gone = db.query(models.MediaBlob).filter(models.MediaBlob.hash == blob_hash).first() is None
+    expect(collected and gone, "collect deletes the unreferenced blob row")
+    expect(not backend.exists(key) and not backend.exists(derived), "and its object and derived files")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check media_store's S3 backend against a local stand-in")
+    parser.add_argument("--endpoint-url", help="S3-compatible endpoint such as MinIO (default: start moto)")
+    args = parser.parse_args()
+
+    server = None
+    endpoint_url = args.endpoint_url
+    if not endpoint_url:
+        server, endpoint_url = start_moto()
+
+    tag = uuid.uuid4().hex[:8]
+    data = f"check-{tag}".encode() * 1000
+    backend = media_store.S3Backend(f"luxenext-check-{tag}", endpoint_url)
+    backend.client.create_bucket(Bucket=backend.bucket)
+    saved = media_store.backend, media_store.MEDIA_ROOT
+    db = SessionLocal()
+    try:
+        with tempfile.TemporaryDirectory() as media_root:
+            media_store.backend, media_store.MEDIA_ROOT = backend, media_root  # MEDIA_ROOT only holds temp files here
+            failures = run(db, backend, data)
+    finally:
+        media_store.backend, media_store.MEDIA_ROOT = saved
+        db.rollback()
+        blob_hash = hashlib.sha256(data).hexdigest()
+        db.query(models.MediaBlob).filter(models.MediaBlob.hash == blob_hash).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+        objects = backend.client.list_objects_v2(Bucket=backend.bucket).get("Contents", [])
+        for obj in objects:
+            backend.delete(obj["Key"])
+        backend.client.delete_bucket(Bucket=backend.bucket)
+        if server:
+            server.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
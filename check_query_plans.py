@@ -0,0 +1,128 @@
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event, func, select
+
+import category_stats
+import crud
+import models
+import reservations
+from database import SessionLocal, engine
+
+# check_query_plans.py
+# Runs the selective catalog/account queries the way crud.py issues them,
+# captures their SQL and EXPLAINs each one with enable_seqscan off. With seq
+# scans priced out, Postgres only falls back to one when no index can serve
+# the query, so a "Seq Scan" node means a missing or unusable index whatever
+# the table size. Exits 1 if any query has one. Needs a migrated database.
+#
+#     python check_query_plans.py
+#     python check_query_plans.py --verbose
+
+
+def _bounds_query(db, category_id):
+    # category_stats recomputes a category's price bounds with this shape
+    products = category_stats.products
+    in_category = (products.c.category_id == category_id) & category_stats.is_active
+    return db.execute(select(func.min(products.c.price), func.max(products.c.price)).where(in_category)).all()
+
+
+def _expired_holds_query(db):
+    # what the reservation sweeper scans for, without running it
+    holds = reservations.holds
+    return db.execute(select(holds.c.order_id).where(holds.c.expires_at <= datetime.utcnow())).all()
+
+
+def _top_products_query(db, key_columns):
+    # GET /products/top pages with this keyset (router_product.get_top_products)
+    return crud.paginate_keyset(db.query(models.Product), key_columns, 10, crud.encode_cursor([5, 10**6][-len(key_columns):]))
+
+
+def _checkout_cart_lock(db, user_id):
+    # crud.checkout_cart's first statement (EXPLAIN does not take the lock)
+    return db.query(models.Cart).filter(models.Cart.user_id == user_id).with_for_update().first()
+
+
+CASES = [
+    ("products page", lambda db: crud.get_products(db)),
+    ("products page after a cursor", lambda db: crud.get_products(db, cursor=crud.encode_cursor([10**6]))),
+    ("search (full-text)", lambda db: crud.search_products(db, "phone")),
+    ("search (fuzzy)", lambda db: crud.search_products(db, "phnoe", mode="fuzzy")),
+    ("search facets", lambda db: crud.search_facets(db, "phone", list(crud.SEARCH_FACETS))),
+    ("did you mean", lambda db: crud.suggest_product_names(db, "phnoe")),
+    ("top products by sales", lambda db: _top_products_query(db, [models.Product.sales_count, models.Product.id])),
+    ("top products by views", lambda db: _top_products_query(db, [models.Product.view_count, models.Product.id])),
+    ("trending products", lambda db: db.query(models.Product).filter(models.Product.id.in_([1, 2, 3])).all()),
+    ("cart by user", lambda db: crud.load_cart(db, 1)),
+    ("cart by user (checkout lock)", lambda db: _checkout_cart_lock(db, 1)),
+    ("products by category", lambda db: crud.get_products_by_category(db, 1)),
+    ("products by category subtree", lambda db: crud.get_products_by_category(db, 1, include_descendants=True)),
+    ("category price bounds", lambda db: _bounds_query(db, 1)),
+    ("orders by user", lambda db: crud.get_orders_by_user(db, 1)),
+    ("order items of an order", lambda db: db.query(models.OrderItem).filter(models.OrderItem.order_id == 1).all()),
+    ("addresses by user", lambda db: crud.get_addresses(db, 1)),
+    ("wishlist by user", lambda db: crud.get_user_wishlist(db, 1)),
+    ("cart items of a cart", lambda db: db.query(models.CartItem).filter(models.CartItem.cart_id == 1).all()),
+    ("reviews of a product", lambda db: db.query(models.Review).filter(models.Review.product_id == 1).all()),
+    ("expired stock holds", lambda db: _expired_holds_query(db)),
+]
+
+
+@contextmanager
+def capture(statements: list):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seq_scans(plan: dict) -> list:
+    found = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+def explain(db, statement: str, parameters) -> dict:
+    cursor = db.connection().connection.cursor()
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+    plan = cursor.fetchone()[0]
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a catalog query cannot use an index")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    failed = 0
+    db = SessionLocal()
+    try:
+        for name, run in CASES:
+            statements = []
+            with capture(statements):
+                run(db)
+            for statement, parameters in statements:
+                plan = explain(db, statement, parameters)
+                scanned = seq_scans(plan)
+                print(f"{'FAIL' if scanned else 'ok  '}  {name}" + (f"  (seq scan on {', '.join(scanned)})" if scanned else ""))
+                if args.verbose or scanned:
+                    print(json.dumps(plan, indent=2))
+                failed += bool(scanned)
+            db.rollback()
+    finally:
+        db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import models
+import remote_import
+from database import SessionLocal
+
+# check_remote_import.py
+# Runs remote_import.run_import against a local DummyJSON stand-in: a paged
+# category (several limit/skip pages), one that answers 503 twice before
+# succeeding (retries), one that 404s (reported, import carries on) and one
+# invalid product (counted as failed). A second run must update instead of
+# insert, and a run whose producer raises must end "failed" with no tasks left
+# behind. Writes products/categories named chk-<tag>-* and deletes them
+# afterwards; point DATABASE_URL at a scratch database anyway.
+#
+#     python check_remote_import.py
+
+PAGED_PRODUCTS = 250
+FLAKY_FAILURES = 2
+
+
+def make_stand_in(tag: str):
+    paged, flaky, gone = f"chk-{tag}-paged", f"chk-{tag}-flaky", f"chk-{tag}-gone"
+    catalog = {
+        paged: [{"title": f"chk-{tag}-p{i}", "price": 10 + i, "stock": 5, "description": "d"} for i in range(PAGED_PRODUCTS)],
+        flaky: [{"title": f"chk-{tag}-f{i}", "price": 20, "stock": 1} for i in range(4)]
+               + [{"title": f"chk-{tag}-bad", "price": "not a price", "stock": 1}],
+    }
+
+    class StandIn(BaseHTTPRequestHandler):
+        broken = False  # serve a category list the producers cannot handle
+        flaky_left = FLAKY_FAILURES
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def do_GET(self):
+            with self.lock:
+                StandIn.in_flight += 1
+                StandIn.max_in_flight = max(StandIn.max_in_flight, StandIn.in_flight)
+            try:
+                time.sleep(0.02)  # long enough for concurrent requests to overlap
+                self._route()
+            finally:
+                with self.lock:
+                    StandIn.in_flight -= 1
+
+        def _route(self):
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/products/categories":
+                if StandIn.broken:
+                    return self._json(200, [{"name": "no slug"}])
+                return self._json(200, [{"slug": slug, "name": slug} for slug in (paged, flaky, gone)])
+
+            slug = url.path.rsplit("/", 1)[-1]
+            if slug not in catalog:
+                return self._json(404, {"message": f"Category {slug} not found"})
+            if slug == flaky:
+                with self.lock:
+                    fail = StandIn.flaky_left > 0
+                    StandIn.flaky_left -= fail
+                if fail:
+                    return self._json(503, {"message": "try again"})
+            limit, skip = int(query["limit"][0]), int(query["skip"][0])
+            products = catalog[slug]
+            self._json(200, {"products": products[skip:skip + limit], "total": len(products), "skip": skip, "limit": limit})
+
+        def _json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StandIn
+
+
+async def run(base_url: str, stand_in) -> list:
+    failures = []
+
+    def expect(ok, what):
+        print(f"{'ok  ' if ok else 'FAIL'}  {what}")
+        if not ok:
+            failures.append(what)
+
+    # 1️⃣ First import inserts everything valid
+    job = await remote_import.run_import(remote_import.create_job(), base_url, batch_size=100)
+    valid = PAGED_PRODUCTS + 4
+    expect(job["status"] == "completed", f"import completed ({job['status']}: {job['error']})")
+    expect(job["categories_done"] == 3 and job["products_fetched"] == valid + 1, "every page of every category fetched")
+    expect((job["inserted"], job["updated"], job["failed"]) == (valid, 0, 1),
+           f"inserted/updated/failed = {job['inserted']}/{job['updated']}/{job['failed']}")
+    expect(stand_in.flaky_left == 0, "503s retried")
+    expect(any("gone" in e.get("category", "") for e in job["errors"]), "404 category reported")
+    expect(1 < stand_in.max_in_flight <= remote_import.CONCURRENCY,
+           f"requests overlap within REMOTE_IMPORT_CONCURRENCY (max in flight {stand_in.max_in_flight})")
+
+    # 2️⃣ Running it again updates the same rows
+    job = await remote_import.run_import(remote_import.create_job(), base_url, batch_size=100)
+    expect((job["inserted"], job["updated"]) == (0, valid), "second import updates instead of inserting")
+
+    # 3️⃣ A producer that raises ends the job and leaves nothing running
+    stand_in.broken = True
+    job = await remote_import.run_import(remote_import.create_job(), base_url, batch_size=100)
+    leftover = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    expect(job["status"] == "failed" and job["finished_at"] is not None, f"producer error fails the job ({job['error']})")
+    expect(not leftover, "no producer or writer task left running")
+    return failures
+
+
+def teardown(tag: str):
+    db = SessionLocal()
+    try:
+        db.query(models.Product).filter(models.Product.name.like(f"chk-{tag}-%")).delete(synchronize_session=False)
+        # category_stats and category_closure rows go with their category (ON DELETE CASCADE)
+        db.query(models.Category).filter(models.Category.name.like(f"chk-{tag}-%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    tag = uuid.uuid4().hex[:8]
+    stand_in = make_stand_in(tag)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stand_in)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        failures = asyncio.run(run(f"http://127.0.0.1:{server.server_address[1]}", stand_in))
+    finally:
+        server.shutdown()
+        teardown(tag)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
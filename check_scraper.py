@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scraper
+
+# check_scraper.py
+# Runs scraper.py against a local HTTP stand-in (no network, no database):
+# a page that revalidates with ETag and an image with Last-Modified (both must
+# come back as 304 and reuse the cached body), oversized responses with and
+# without Content-Length (size cap), a 404, and a burst of requests to one
+# host (per-host spacing between request starts). Exits 1 on any failure.
+#
+#     python check_scraper.py
+#     python check_scraper.py --interval 0.2
+
+PAGE = b'<html><head><meta property="og:image" content="/image.png"></head><body></body></html>'
+IMAGE = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+ETAG = '"page-v1"'
+LAST_MODIFIED = formatdate(time.time() - 3600, usegmt=True)
+MAX_BYTES = 4096
+
+
+class StandIn(BaseHTTPRequestHandler):
+    log = []  # (path, status, monotonic start)
+
+    def do_GET(self):
+        started = time.monotonic()
+        if self.path == "/page.html":
+            if self.headers.get("If-None-Match") == ETAG:
+                status = self._send(304)
+            else:
+                status = self._send(200, PAGE, "text/html; charset=utf-8", {"ETag": ETAG})
+        elif self.path == "/image.png":
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                status = self._send(304)
+            else:
+                status = self._send(200, IMAGE, "image/png", {"Last-Modified": LAST_MODIFIED})
+        elif self.path == "/big-declared":
+            status = self._send(200, b"x" * (MAX_BYTES * 2), "image/png")
+        elif self.path == "/big-streamed":
+            # No Content-Length: the cap has to trip while reading
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.end_headers()
+            self.wfile.write(b"x" * (MAX_BYTES * 2))
+            status = 200
+        elif self.path.startswith("/burst/"):
+            status = self._send(200, IMAGE, "image/png")
+        else:
+            status = self._send(404, b"not found", "text/plain")
+        self.log.append((self.path, status, started))
+
+    def _send(self, status, body=b"", content_type=None, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+        return status
+
+    def log_message(self, *args):
+        pass
+
+
+def statuses(path):
+    return [status for logged, status, _ in StandIn.log if logged == path]
+
+
+async def check(base: str, interval: float) -> list:
+    failures = []
+
+    def expect(ok, what):
+        print(f"{'ok  ' if ok else 'FAIL'}  {what}")
+        if not ok:
+            failures.append(what)
+
+    # 1️⃣ First scrape fills the cache: page, then its og:image
+    body, content_type, image_url = await scraper.scrape_image(f"{base}/page.html")
+    expect(body == IMAGE and content_type == "image/png" and image_url == f"{base}/image.png", "page → og:image")
+
+    # 2️⃣ Within the TTL nothing is requested again
+    await scraper.scrape_image(f"{base}/page.html")
+    expect(statuses("/page.html") == [200] and statuses("/image.png") == [200], "fresh cache entries are reused")
+
+    # 3️⃣ Past the TTL both are revalidated; 304 reuses the stored bodies
+    scraper.SCRAPE_CACHE_TTL = 0
+    body, _, _ = await scraper.scrape_image(f"{base}/page.html")
+    expect(statuses("/page.html") == [200, 304], "ETag revalidation → 304")
+    expect(statuses("/image.png") == [200, 304], "Last-Modified revalidation → 304")
+    expect(body == IMAGE, "304 serves the cached body")
+
+    # 4️⃣ Size cap, declared and streamed
+    for path in ("/big-declared", "/big-streamed"):
+        try:
+            await scraper.fetch(f"{base}{path}")
+            expect(False, f"size cap on {path}")
+        except scraper.ScrapeError as e:
+            expect("larger than" in str(e), f"size cap on {path}")
+
+    # 5️⃣ 404 is an error, not a cached body
+    try:
+        await scraper.fetch(f"{base}/missing.png")
+        expect(False, "404 raises ScrapeError")
+    except scraper.ScrapeError as e:
+        expect("404" in str(e), "404 raises ScrapeError")
+
+    # 6️⃣ A burst to one host is spaced out by the per-host interval
+    await asyncio.gather(*[scraper.fetch(f"{base}/burst/{i}") for i in range(5)])
+    starts = sorted(started for path, _, started in StandIn.log if path.startswith("/burst/"))
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    expect(len(starts) == 5 and min(gaps) >= interval * 0.9,
+           f"per-host spacing ≥ {interval}s (gaps: {', '.join(f'{g:.2f}' for g in gaps)})")
+
+    await scraper.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check scraper.py against a local HTTP stand-in")
+    parser.add_argument("--interval", type=float, default=scraper.SCRAPE_HOST_INTERVAL, help="per-host spacing to check")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        scraper.SCRAPE_CACHE_DIR = cache_dir
+        scraper.SCRAPE_MAX_BYTES = MAX_BYTES
+        scraper._limiter = scraper.HostLimiter(interval=args.interval)
+        try:
+            failures = asyncio.run(check(f"http://127.0.0.1:{server.server_address[1]}", args.interval))
+        finally:
+            server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,99 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from sqlalchemy import Integer, case, column, delete, func, insert, literal, literal_column, null, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import HTTPException
 from typing import List, Optional
+from collections import Counter
 from datetime import datetime
 import models
 import schemas
+import autocomplete
+import category_stats
+import reservations
+import media_store
+import media_server
+from response_cache import catalog_cache
+import trending
 from models import Cart, CartItem, Product ,Coupon, Order, OrderItem
 import os
 import random, string
+import base64, binascii, json
 from PIL import Image
 
+# -------------------
+# Keyset (cursor) pagination
+# -------------------
+def encode_cursor(values: list) -> str:
+    """Pack the sort-key values of the last row into an opaque, URL-safe cursor."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_columns: list) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(key_columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if col.type.python_type is datetime else col.type.python_type(v)
+            for col, v in zip(key_columns, values)
+        ]
+    except (binascii.Error, ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate_keyset(query, key_columns: list, limit: int, cursor: Optional[str] = None, descending: bool = True):
+    """
+    Seek past `cursor` instead of OFFSET-ing, so page N costs the same as page 1.
+    The last key column must be unique (normally the primary key).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        key = tuple_(*key_columns)
+        values = tuple_(*decode_cursor(cursor, key_columns))
+        query = query.filter(key < values if descending else key > values)
+
+    order = [col.desc() if descending else col.asc() for col in key_columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], col.key) for col in key_columns])
+    return rows, next_cursor
+
+
+# Columns a client may ask for with ?fields= (search_vector is internal)
+PRODUCT_FIELDS = tuple(attr.key for attr in models.Product.__mapper__.column_attrs if attr.key != "search_vector")
+ORDER_FIELDS = tuple(attr.key for attr in models.Order.__mapper__.column_attrs)
+
+
+def parse_fields(fields: Optional[str], allowed: tuple) -> Optional[List[str]]:
+    """?fields=id,name,price → ["id", "name", "price"]; None means every column."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return requested
+
+
+def with_fields(query, model, fields: Optional[List[str]]):
+    """
+    Restrict the SELECT to `fields` (the primary key is always loaded).
+    Columns that are not loaded never reach the instance __dict__, so the
+    JSON encoder leaves them out of the response as well.
+    """
+    if not fields:
+        return query
+    return query.options(load_only(*[getattr(model, f) for f in fields], raiseload=True))
+
+
 # -------------------
 # Coupon CRUD
 # -------------------
@@ -145,36 +230,142 @@ def delete_address(db: Session, address_id: int):
 # -------------------
 
 
+def link_category(db: Session, category_id: int, parent_id: Optional[int]):
+    """Closure rows for a new leaf: itself at depth 0 plus each ancestor of its parent, one level deeper."""
+    closure = models.CategoryClosure.__table__
+    rows = select(literal(category_id), literal(category_id), literal(0))
+    if parent_id is not None:
+        rows = rows.union_all(
+            select(closure.c.ancestor_id, literal(category_id), closure.c.depth + 1)
+            .where(closure.c.descendant_id == parent_id)
+        )
+    db.execute(
+        pg_insert(closure)
+        .from_select(["ancestor_id", "descendant_id", "depth"], rows)
+        .on_conflict_do_nothing()
+    )
+
+
+def _move_category(db: Session, category_id: int, parent_id: Optional[int]):
+    """Re-hang the subtree rooted at `category_id` under `parent_id` (None → root)."""
+    closure = models.CategoryClosure.__table__
+    subtree = closure.alias("subtree")
+    in_subtree = select(subtree.c.descendant_id).where(subtree.c.ancestor_id == category_id)
+
+    # Cut the paths from the old ancestors into the subtree
+    db.execute(
+        delete(closure).where(
+            closure.c.descendant_id.in_(in_subtree),
+            closure.c.ancestor_id.not_in(in_subtree),
+        )
+    )
+    if parent_id is None:
+        return
+
+    # Every ancestor of the new parent × every node of the subtree
+    above, below = closure.alias("above"), closure.alias("below")
+    db.execute(
+        closure.insert().from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+            .where(above.c.descendant_id == parent_id, below.c.ancestor_id == category_id),
+        )
+    )
+
+
+def _check_parent(db: Session, parent_id: Optional[int], category_id: Optional[int] = None):
+    if parent_id is None:
+        return
+    if not get_category(db, parent_id):
+        raise HTTPException(status_code=400, detail="Parent category not found")
+    if category_id is not None and parent_id in get_category_subtree_ids(db, category_id):
+        raise HTTPException(status_code=400, detail="A category cannot be moved under itself or its subcategories")
+
+
 def create_category(db: Session, category: schemas.CategoryCreate):
+    _check_parent(db, category.parent_id)
     db_category = models.Category(**category.model_dump())
     db.add(db_category)
+    db.flush()
+    link_category(db, db_category.id, db_category.parent_id)
     db.commit()
     db.refresh(db_category)
+    autocomplete.index.add(db_category.name, autocomplete.CATEGORY)
+    catalog_cache.invalidate("categories")
     return db_category
 
 def get_category(db: Session, category_id: int):
     return db.query(models.Category).filter(models.Category.id == category_id).first()
 
 def get_categories(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Category).offset(skip).limit(limit).all()
+    return db.query(models.Category).options(joinedload(models.Category.stats)).offset(skip).limit(limit).all()
+
+def category_subtree(category_id: int):
+    """SELECT of the ids in the subtree rooted at `category_id` (itself included)."""
+    closure = models.CategoryClosure
+    return select(closure.descendant_id).where(closure.ancestor_id == category_id)
+
+def get_category_subtree_ids(db: Session, category_id: int) -> List[int]:
+    return list(db.execute(category_subtree(category_id)).scalars())
+
+def get_category_tree(db: Session) -> List[dict]:
+    """The whole hierarchy as nested dicts, built from a single query."""
+    stats = models.CategoryStats
+    categories = (
+        db.query(
+            models.Category.id, models.Category.name, models.Category.description, models.Category.parent_id,
+            stats.product_count, stats.in_stock_count, stats.min_price, stats.max_price
+        )
+        .outerjoin(stats, stats.category_id == models.Category.id)
+        .order_by(models.Category.name)
+        .all()
+    )
+    nodes = {
+        c.id: {
+            "id": c.id, "name": c.name, "description": c.description, "parent_id": c.parent_id,
+            "stats": {
+                "product_count": c.product_count or 0, "in_stock_count": c.in_stock_count or 0,
+                "min_price": c.min_price, "max_price": c.max_price,
+            },
+            "children": [],
+        }
+        for c in categories
+    }
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+    return roots
 
 def update_category(db: Session, category_id: int, category: schemas.CategoryUpdate):
     db_category = get_category(db, category_id)
     if db_category:
-        for key, value in category.model_dump(exclude_unset=True).items():
+        old_name, old_parent_id = db_category.name, db_category.parent_id
+        data = category.model_dump(exclude_unset=True)
+        moved = "parent_id" in data and data["parent_id"] != old_parent_id
+        if moved:
+            _check_parent(db, data["parent_id"], category_id)
+        for key, value in data.items():
             setattr(db_category, key, value)
+        if moved:
+            db.flush()
+            _move_category(db, category_id, db_category.parent_id)
         db.commit()
         db.refresh(db_category)
+        autocomplete.index.rename(old_name, db_category.name, autocomplete.CATEGORY)
+        catalog_cache.invalidate("categories")
     return db_category
 
 def delete_category(db: Session, category_id: int):
     db_category = get_category(db, category_id)
     if db_category:
         # Optional: prevent delete if products exist
-        if db_category.products:
+        if db_category.products or db_category.subcategories:
             return None
-        db.delete(db_category)
+        db.delete(db_category)  # closure rows go with it (ON DELETE CASCADE)
         db.commit()
+        autocomplete.index.remove(db_category.name, autocomplete.CATEGORY)
+        catalog_cache.invalidate("categories")
     return db_category
 
 # -------------------
@@ -183,51 +374,121 @@ def delete_category(db: Session, category_id: int):
 def create_product(db: Session, product: schemas.ProductCreate):
     db_product = models.Product(**product.model_dump())
     db.add(db_product)
+    media_store.acquire(db, db_product.image_hash)
+    db.flush()
+    category_stats.record_changes(db, [(None, category_stats.snapshot(db_product))])
     db.commit()
     db.refresh(db_product)
+    autocomplete.index.set_product(db_product.id, db_product.name, db_product.is_active)
+    catalog_cache.invalidate("products", "categories")
     return db_product
 
 def get_product(db: Session, product_id: int):
     return db.query(models.Product).filter(models.Product.id == product_id).first()
 
-def get_products(db: Session):
-    return db.query(models.Product).all()
+def get_products(db: Session, limit: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None):
+    # Newest first; the primary key doubles as the keyset so no extra index is needed
+    query = with_fields(db.query(models.Product), models.Product, fields)
+    return paginate_keyset(query, [models.Product.id], limit, cursor)
+
+
+def get_products_by_category(
+    db: Session,
+    category_id: int,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    include_descendants: bool = False
+):
+    query = with_fields(db.query(models.Product), models.Product, fields)
+    if include_descendants:
+        query = query.filter(models.Product.category_id.in_(category_subtree(category_id)))
+    else:
+        query = query.filter(models.Product.category_id == category_id)
+    return paginate_keyset(query, [models.Product.id], limit, cursor)
 
 
 def update_product(db: Session, product_id: int, product: schemas.ProductUpdate):
     db_product = get_product(db, product_id)
     if db_product:
-        for key, value in product.model_dump(exclude_unset=True).items():
+        old_hash = db_product.image_hash
+        before = category_stats.snapshot(db_product)
+        data = product.model_dump(exclude_unset=True)
+        for key, value in data.items():
             setattr(db_product, key, value)
+        replaced = "image_hash" in data and data["image_hash"] != old_hash
+        if replaced:
+            media_store.acquire(db, db_product.image_hash)
+            media_store.release(db, old_hash)
+        db.flush()
+        category_stats.record_changes(db, [(before, category_stats.snapshot(db_product))])
         db.commit()
+        if replaced:
+            media_store.collect(db, old_hash)
         db.refresh(db_product)
+        autocomplete.index.set_product(product_id, db_product.name, db_product.is_active)
+        media_server.product_media.forget(product_id)
+        catalog_cache.invalidate("products", f"product:{product_id}", "categories")
     return db_product
 
 
 def delete_product(db: Session, product: models.Product):
+    product_id, image_hash = product.id, product.image_hash
+    before = category_stats.snapshot(product)
     db.delete(product)
+    media_store.release(db, image_hash)
+    db.flush()
+    category_stats.record_changes(db, [(before, None)])
     db.commit()
+    media_store.collect(db, image_hash)
+    media_server.product_media.forget(product_id)
+    autocomplete.index.remove_product(product_id)
+    catalog_cache.invalidate("products", f"product:{product_id}", "categories")
 
 
 
 
-def search_products(
+# Text search configuration used for Product.search_vector (see models.py)
+SEARCH_CONFIG = "english"
+
+# Minimum pg_trgm word similarity for a fuzzy match / "did you mean" suggestion
+FUZZY_THRESHOLD = float(os.getenv("FUZZY_SEARCH_THRESHOLD", "0.3"))
+
+
+def _set_fuzzy_threshold(db: Session):
+    # Transaction-local, so pooled connections keep the server default
+    db.execute(func.set_config("pg_trgm.word_similarity_threshold", str(FUZZY_THRESHOLD), True).select())
+
+
+def _search_query(
     db: Session,
     q: str,
     category_id: Optional[int] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort: Optional[str] = "relevance",
-    skip: int = 0,
-    limit: int = 20
-) -> List[models.Product]:
+    mode: str = "fulltext"
+):
+    """Filtered (unsorted, unpaginated) search query plus its relevance expression."""
     query = db.query(models.Product)
 
     # 🔍 Search by name or description
-    query = query.filter(
-        (models.Product.name.ilike(f"%{q}%")) |
-        (models.Product.description.ilike(f"%{q}%"))
-    )
+    if mode == "basic":
+        # Substring match; cannot use an index, kept for exact partial-word lookups
+        query = query.filter(
+            (models.Product.name.ilike(f"%{q}%")) |
+            (models.Product.description.ilike(f"%{q}%"))
+        )
+        rank = None
+    elif mode == "fuzzy":
+        # Typo-tolerant: trigram word similarity on name, served by the GIN trigram index
+        _set_fuzzy_threshold(db)
+        query = query.filter(models.Product.name.op("%>")(q))
+        rank = func.word_similarity(q, models.Product.name)
+    else:
+        # GIN-indexed tsvector match, ranked by cover density (name hits weigh more)
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        query = query.filter(models.Product.search_vector.op("@@")(ts_query))
+        rank = func.ts_rank_cd(models.Product.search_vector, ts_query)
 
     # 🏷️ Category filter
     if category_id:
@@ -239,6 +500,24 @@ def search_products(
     if max_price is not None:
         query = query.filter(models.Product.price <= max_price)
 
+    return query, rank
+
+
+def search_products(
+    db: Session,
+    q: str,
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: Optional[str] = "relevance",
+    skip: int = 0,
+    limit: int = 20,
+    mode: str = "fulltext",
+    fields: Optional[List[str]] = None
+) -> List[models.Product]:
+    query, rank = _search_query(db, q, category_id, min_price, max_price, mode)
+    query = with_fields(query, models.Product, fields)
+
     # 📊 Sorting
     if sort == "price_asc":
         query = query.order_by(models.Product.price.asc())
@@ -248,14 +527,105 @@ def search_products(
         query = query.order_by(models.Product.name.asc())
     elif sort == "name_desc":
         query = query.order_by(models.Product.name.desc())
+    elif rank is not None:
+        query = query.order_by(rank.desc(), models.Product.id.desc())
     else:
-        # Default "relevance" → order by ID newest first
+        # "relevance" without a rank → order by ID newest first
         query = query.order_by(models.Product.id.desc())
 
     # 📑 Pagination
     return query.offset(skip).limit(limit).all()
 
 
+# Price band edges (₦) for the "price" facet; the last band is open-ended
+PRICE_BANDS = [0, 5000, 20000, 50000, 100000, 500000]
+SEARCH_FACETS = ("category", "price")
+
+
+def search_facets(
+    db: Session,
+    q: str,
+    facets: List[str],
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    mode: str = "fulltext"
+) -> dict:
+    """
+    Facet counts for the whole result set of a search (not just the current page).
+    Every requested facet comes out of one GROUP BY GROUPING SETS query.
+    """
+    query, _ = _search_query(db, q, category_id, min_price, max_price, mode)
+
+    # Thresholds are inlined so the expression in SELECT and GROUP BY is identical
+    thresholds = literal_column(f"ARRAY[{','.join(str(edge) for edge in PRICE_BANDS)}]::float8[]")
+    band = func.width_bucket(models.Product.price, thresholds)
+
+    want_category = "category" in facets
+    want_price = "price" in facets
+    if not (want_category or want_price):
+        return {}
+
+    sets = []
+    if want_category:
+        sets.append(tuple_(models.Product.category_id, models.Category.name))
+    if want_price:
+        sets.append(tuple_(band))
+
+    rows = (
+        query.outerjoin(models.Category, models.Category.id == models.Product.category_id)
+        .with_entities(
+            models.Product.category_id if want_category else null(),
+            models.Category.name if want_category else null(),
+            band if want_price else null(),
+            # 0 on rows of the category grouping set, 1 on rows of the price set
+            func.grouping(models.Product.category_id) if want_category else literal_column("1"),
+            func.count(),
+        )
+        .group_by(func.grouping_sets(*sets))
+        .all()
+    )
+
+    result = {}
+    if want_category:
+        result["category"] = []
+    if want_price:
+        result["price"] = []
+    for cat_id, cat_name, bucket, category_grouping, count in rows:
+        if want_category and category_grouping == 0:
+            result["category"].append({"category_id": cat_id, "name": cat_name, "count": count})
+        elif want_price:
+            # width_bucket → 1..len(PRICE_BANDS) for prices >= 0
+            i = max(bucket, 1) - 1
+            upper = PRICE_BANDS[i + 1] if i + 1 < len(PRICE_BANDS) else None
+            result["price"].append({"min": PRICE_BANDS[i], "max": upper, "count": count})
+
+    if "category" in result:
+        result["category"].sort(key=lambda f: f["count"], reverse=True)
+    if "price" in result:
+        result["price"].sort(key=lambda f: f["min"])
+    return result
+
+
+def suggest_product_names(db: Session, q: str, limit: int = 5) -> List[str]:
+    """ "Did you mean" terms: the product names closest to `q` by trigram similarity. """
+    _set_fuzzy_threshold(db)
+    similarity = func.word_similarity(q, models.Product.name)
+    rows = (
+        db.query(models.Product.name)
+        .filter(models.Product.name.op("%>")(q))
+        .order_by(similarity.desc())
+        .limit(limit * 3)
+        .all()
+    )
+
+    suggestions = []
+    for (name,) in rows:
+        if name not in suggestions:
+            suggestions.append(name)
+    return suggestions[:limit]
+
+
 # -------------------
 # User CRUD
 # -------------------
@@ -311,8 +681,9 @@ def generate_order_reference(length=10):
 # ===============================
 # Get Orders by User
 # ===============================
-def get_orders_by_user(db: Session, user_id: int):
-    return db.query(models.Order).filter(models.Order.user_id == user_id).all()
+def get_orders_by_user(db: Session, user_id: int, fields: Optional[List[str]] = None):
+    query = with_fields(db.query(models.Order), models.Order, fields)
+    return query.filter(models.Order.user_id == user_id).all()
 
 
 # ===============================
@@ -343,10 +714,11 @@ def cancel_order(db: Session, order_id: int):
     """
     Cancel an order:
     - Sets status to 'cancelled'
-    - Restores product stock
+    - Restores product stock (releases the holds of an unpaid order)
     - Keeps order in DB for history
     """
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    # Locked so the reservation sweeper skips it while we cancel
+    order = db.query(models.Order).filter(models.Order.id == order_id).with_for_update().first()
     if not order:
         return None
 
@@ -357,14 +729,18 @@ def cancel_order(db: Session, order_id: int):
     # Update order status
     order.status = "cancelled"
 
-    # Restore stock
-    for item in order.items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        if product:
-            product.stock += item.quantity
-            db.add(product)
+    released = reservations.release(db, [order.id])
+    if not released:
+        # Paid orders hold nothing: restore their sold units and take the sale back out of the counters
+        sold = Counter()
+        for item in order.items:
+            if item.product_id is not None:
+                sold[item.product_id] += item.quantity
+        reservations.restock(db, sold)
 
     db.commit()
+    # Stock is part of the cached product payloads
+    catalog_cache.invalidate("products", *[f"product:{item.product_id}" for item in order.items], "categories")
     db.refresh(order)
     return order
 
@@ -420,31 +796,11 @@ def create_cart(db: Session, cart: schemas.CartCreate):
         db.commit()
         db.refresh(db_cart)
 
-    # Add items if provided
-    for item in cart.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            continue
-
-        # Check if item already exists
-        db_item = db.query(CartItem).filter(
-            CartItem.cart_id == db_cart.id,
-            CartItem.product_id == item.product_id
-        ).first()
-
-        if db_item:
-            db_item.quantity += item.quantity
-        else:
-            db_item = CartItem(
-                cart_id=db_cart.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                price_at_addition=product.price  # snapshot
-            )
-            db.add(db_item)
-
-    db.commit()
-    db.refresh(db_cart)
+    # Add items if provided (unknown products are skipped)
+    if cart.items:
+        known = {pid for (pid,) in db.query(Product.id).filter(Product.id.in_([i.product_id for i in cart.items]))}
+        add_cart_items(db, db_cart.id, [item for item in cart.items if item.product_id in known])
+        db.refresh(db_cart)
     return db_cart  # ✅ return ORM object
 
 
@@ -452,74 +808,103 @@ def create_cart(db: Session, cart: schemas.CartCreate):
 # Add Item to Cart
 # ===============================
 
-def add_cart_item(db: Session, cart_id: int, item: schemas.CartItemCreate):
-    product = db.query(Product).filter(Product.id == item.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+TAX_RATE = 0.05
+
+
+def bump_cart_totals(db: Session, cart_id: int, subtotal_delta: float, count_delta: int):
+    """Move the cart's running totals by a delta (same transaction as the item change)."""
+    if not subtotal_delta and not count_delta:
+        return
+    new_count = Cart.item_count + count_delta
+    db.execute(
+        update(Cart)
+        .where(Cart.id == cart_id)
+        .values(
+            item_count=new_count,
+            # An emptied cart snaps back to exactly 0 instead of carrying float drift
+            subtotal=case((new_count == 0, 0.0), else_=Cart.subtotal + subtotal_delta),
+        )
+    )
 
-    db_item = db.query(CartItem).filter(
-        CartItem.cart_id == cart_id,
-        CartItem.product_id == item.product_id
-    ).first()
 
-    if db_item:
-        # ✅ update quantity
-        db_item.quantity += item.quantity
-    else:
-        # ✅ create new cart item
-        db_item = CartItem(
-            cart_id=cart_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_at_addition=product.price,  # snapshot at add time
+def refresh_cart_totals(db: Session, cart_ids: List[int]):
+    """Recompute the totals of these carts from their items (after a bulk write)."""
+    lines = CartItem.cart_id == Cart.id
+    db.execute(
+        update(Cart)
+        .where(Cart.id.in_(cart_ids))
+        .values(
+            subtotal=select(func.coalesce(func.sum(CartItem.price_at_addition * CartItem.quantity), 0.0)).where(lines).scalar_subquery(),
+            item_count=select(func.coalesce(func.sum(CartItem.quantity), 0)).where(lines).scalar_subquery(),
         )
-        db.add(db_item)
+    )
+
+
+def add_cart_item(db: Session, cart_id: int, item: schemas.CartItemCreate):
+    return add_cart_items(db, cart_id, [item])[0]
 
+
+def add_cart_items(db: Session, cart_id: int, items: List[schemas.CartItemCreate]) -> List[models.CartItem]:
+    """
+    Add several lines in one statement and one commit, merging quantities into
+    lines already in the cart (unique on cart_id, product_id). 404 if any
+    product does not exist. Returns one item per distinct product, in order.
+    """
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        return []
+
+    # ✅ One IN query for every price snapshot
+    prices = dict(db.query(Product.id, Product.price).filter(Product.id.in_(list(quantities))).all())
+    missing = [str(pid) for pid in quantities if pid not in prices]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {', '.join(missing)}")
+
+    stmt = pg_insert(CartItem).values([
+        {"cart_id": cart_id, "product_id": pid, "quantity": quantity, "price_at_addition": prices[pid]}
+        for pid, quantity in quantities.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        # ✅ Existing lines keep their original price snapshot
+        set_={"quantity": CartItem.quantity + stmt.excluded.quantity},
+    ).returning(CartItem)
+    db_items = {
+        db_item.product_id: db_item
+        for db_item in db.scalars(stmt, execution_options={"populate_existing": True})
+    }
+    # ✅ Totals move by what was just added, at each line's snapshot price
+    bump_cart_totals(
+        db, cart_id,
+        sum(db_items[pid].price_at_addition * quantity for pid, quantity in quantities.items()),
+        sum(quantities.values()),
+    )
+    # Detach so the commit does not expire them (no refresh query per item)
+    for db_item in db_items.values():
+        db.expunge(db_item)
     db.commit()
-    db.refresh(db_item)
-    return db_item
+    return [db_items[pid] for pid in quantities]
 
 
 def get_cart(db: Session, user_id: int):
     return db.query(Cart).filter(Cart.user_id == user_id).first()
   # ✅ still return ORM object
 
- 
-def format_cart(cart: Cart):
-    if not cart:
-        return {"items": [], "subtotal": 0.0, "tax": 0.0, "total": 0.0}
-
-    subtotal = 0.0
-    cart_items = []
-
-    for item in cart.items:
-        if item.product:
-            subtotal += item.price_at_addition * item.quantity
-            cart_items.append({
-                "id": item.id,
-                "cart_id": item.cart_id,
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-                "product_name": item.product.name,
-                "product_price": item.price_at_addition,
-                "product_image": item.product.image_url,
-                "product_thumbnail": item.product.thumbnail_url,
-                "subtotal": item.price_at_addition * item.quantity
-            })
-
-    tax_rate = 0.05
-    tax = subtotal * tax_rate
-    total = subtotal + tax
 
-    return {
-        "id": cart.id,
-        "user_id": cart.user_id,
-        "created_at": cart.created_at,
-        "items": cart_items,
-        "subtotal": subtotal,
-        "tax": tax,
-        "total": total,
-    }
+def load_cart(db: Session, user_id: int):
+    """The cart for display: items and their products in one selectinload round trip."""
+    return (
+        db.query(Cart)
+        .options(
+            selectinload(Cart.items)
+            .joinedload(CartItem.product)
+            .load_only(Product.name, Product.image_url, Product.thumbnail_url)
+        )
+        .filter(Cart.user_id == user_id)
+        .first()
+    )
 
 # ===============================
 # Update Cart Item
@@ -531,10 +916,13 @@ def update_cart_item(db: Session, item_id: int, item: schemas.CartItemUpdate):
 
     if item.quantity is not None:
         if item.quantity <= 0:
+            bump_cart_totals(db, db_item.cart_id, -db_item.price_at_addition * db_item.quantity, -db_item.quantity)
             db.delete(db_item)
             db.commit()
             return None
         else:
+            change = item.quantity - db_item.quantity
+            bump_cart_totals(db, db_item.cart_id, db_item.price_at_addition * change, change)
             db_item.quantity = item.quantity
 
     db.commit()
@@ -548,6 +936,7 @@ def remove_cart_item(db: Session, item_id: int):
     db_item = db.query(CartItem).filter(CartItem.id == item_id).first()
     if not db_item:
         return None
+    bump_cart_totals(db, db_item.cart_id, -db_item.price_at_addition * db_item.quantity, -db_item.quantity)
     db.delete(db_item)
     db.commit()
     return db_item
@@ -556,24 +945,21 @@ def clear_cart(db: Session, cart_id: int):
     items = db.query(models.CartItem).filter(models.CartItem.cart_id == cart_id).all()
     for item in items:
         db.delete(item)
+    db.execute(update(Cart).where(Cart.id == cart_id).values(subtotal=0.0, item_count=0))
     db.commit()
     return items
 
 
 # ===============================
-# Clear Cart
-# ================
-
+# Format Cart
+# ===============================
 def format_cart(cart: Cart):
     if not cart:
-        return {"items": [], "subtotal": 0.0, "tax": 0.0, "total": 0.0}
+        return {"items": [], "subtotal": 0.0, "tax": 0.0, "total": 0.0, "item_count": 0}
 
-    subtotal = 0.0
     cart_items = []
-
     for item in cart.items:
         if item.product:
-            subtotal += item.price_at_addition * item.quantity
             cart_items.append({
                 "id": item.id,
                 "cart_id": item.cart_id,
@@ -586,8 +972,9 @@ def format_cart(cart: Cart):
                 "subtotal": item.price_at_addition * item.quantity
             })
 
-    tax_rate = 0.05
-    tax = subtotal * tax_rate
+    # ✅ Running totals kept on the cart row, not re-summed per view
+    subtotal = cart.subtotal or 0.0
+    tax = subtotal * TAX_RATE
     total = subtotal + tax
 
     return {
@@ -595,49 +982,77 @@ def format_cart(cart: Cart):
         "user_id": cart.user_id,
         "created_at": cart.created_at,
         "items": cart_items,
+        "item_count": cart.item_count or 0,
         "subtotal": subtotal,
         "tax": tax,
         "total": total,
     }
 
 
-def checkout_cart(db: Session, user_id: int, address_id: int, coupon_ids: list[int] = None):
-    # 1️⃣ Get the user's cart
-    cart = db.query(Cart).filter(Cart.user_id == user_id).first()
-    if not cart or not cart.items:
+def checkout_cart(db: Session, user_id: int, address_id: int, coupon_ids: list[int] = None, hold_seconds: Optional[int] = None):
+    """
+    Turn the user's cart into an order in one transaction. Stock is taken by a
+    single UPDATE ... FROM (VALUES ...) WHERE stock >= qty, after locking the
+    product rows in id order, so concurrent checkouts of the same product queue
+    up instead of overselling or deadlocking. Order items go in with one bulk
+    INSERT and the cart is cleared in the same commit.
+
+    The units taken are held for the order until it is paid: they move into
+    reserved_stock and expire after hold_seconds (reservations.RESERVATION_TTL
+    by default), when the sweeper puts them back on sale.
+    """
+    # 1️⃣ Lock the user's cart (a double-submitted checkout waits here, then finds it empty)
+    cart = db.query(Cart).filter(Cart.user_id == user_id).with_for_update().first()
+    lines = (
+        db.query(CartItem.product_id, CartItem.quantity, CartItem.price_at_addition)
+        .filter(CartItem.cart_id == cart.id)
+        .order_by(CartItem.product_id)
+        .all()
+    ) if cart else []
+    if not lines:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Cart is empty")
+    requested = {line.product_id: line.quantity for line in lines}
 
-    subtotal = 0.0
-    order_items_data = []
-
-    # 2️⃣ Validate stock and prepare order items
-    for item in cart.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+    # 2️⃣ Take the stock: lock in id order, then one set-based decrement
+    db.execute(
+        select(Product.id).where(Product.id.in_(list(requested))).order_by(Product.id).with_for_update()
+    )
+    wanted = values(column("id", Integer), column("qty", Integer), name="wanted").data(list(requested.items()))
+    taken = db.execute(
+        update(Product)
+        .where(Product.id == wanted.c.id, Product.stock >= wanted.c.qty)
+        .values(
+            stock=Product.stock - wanted.c.qty,  # 📉 stock
+            reserved_stock=Product.reserved_stock + wanted.c.qty,  # ⏳ held until paid
+            sales_count=Product.sales_count + wanted.c.qty,  # 📈 sales
+        )
+        .returning(Product.id, Product.name, Product.image_url, Product.category_id, Product.is_active, Product.stock, Product.price)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    if len(taken) < len(requested):
+        short = [pid for pid in requested if pid not in {row.id for row in taken}]
+        db.rollback()
+        product = db.query(Product).filter(Product.id == short[0]).first()
         if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        
-        if product.stock < item.quantity:
-             # Raise 400 Bad Request instead of generic Exception to avoid 500 error
-            raise HTTPException(status_code=400, detail=f"Not enough stock for {product.name} (Available: {product.stock}, Requested: {item.quantity})")
-
-        subtotal += item.price_at_addition * item.quantity
-        order_items_data.append({
-            "product_id": item.product_id,
-            "quantity": item.quantity,
-            "price": item.price_at_addition
-        })
-
-    # 3️⃣ Apply tax (5%)
-    tax_rate = 0.05
-    tax = subtotal * tax_rate
+            raise HTTPException(status_code=404, detail=f"Product {short[0]} not found")
+        # Raise 400 Bad Request instead of generic Exception to avoid 500 error
+        raise HTTPException(status_code=400, detail=f"Not enough stock for {product.name} (Available: {product.stock}, Requested: {requested[short[0]]})")
+    products = {row.id: row for row in taken}
+
+    # 3️⃣ Subtotal and tax (5%)
+    subtotal = sum(line.price_at_addition * line.quantity for line in lines)
+    tax = subtotal * TAX_RATE
     total = subtotal + tax
 
     # 4️⃣ Apply coupons if provided
     coupons = []
     discount_total = 0.0
     if coupon_ids:
-        for cid in coupon_ids:
-            coupon = db.query(Coupon).filter(Coupon.id == cid, Coupon.active == True).first()
+        active = {c.id: c for c in db.query(Coupon).filter(Coupon.id.in_(coupon_ids), Coupon.active == True)}
+        for cid in dict.fromkeys(coupon_ids):
+            coupon = active.get(cid)
             if coupon:
                 discount_amount = total * (coupon.discount_percent / 100)
                 total -= discount_amount
@@ -652,36 +1067,43 @@ def checkout_cart(db: Session, user_id: int, address_id: int, coupon_ids: list[i
         discount_amount=discount_total,
         status="pending",
         payment_status="pending",
-        order_reference=generate_order_reference() # ensure unique reference is generated
+        order_reference=generate_order_reference(), # ensure unique reference is generated
+        coupons=coupons,
     )
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-
-    # 6️⃣ Create OrderItems and update stock
-    for item_data in order_items_data:
-        order_item = OrderItem(
-            order_id=db_order.id,
-            product_id=item_data["product_id"],
-            quantity=item_data["quantity"],
-            price=item_data["price"]
+    db.flush()
+
+    # 6️⃣ All OrderItems in one INSERT
+    db.execute(insert(OrderItem), [
+        {
+            "order_id": db_order.id,
+            "product_id": line.product_id,
+            "quantity": line.quantity,
+            "price": line.price_at_addition,
+            "product_snapshot": {"name": products[line.product_id].name, "image_url": products[line.product_id].image_url},
+        }
+        for line in lines
+    ])
+
+    reservations.hold(db, db_order.id, requested, ttl=hold_seconds)
+
+    # 7️⃣ Clear cart
+    db.query(CartItem).filter(CartItem.cart_id == cart.id).delete(synchronize_session=False)
+    db.execute(update(Cart).where(Cart.id == cart.id).values(subtotal=0.0, item_count=0))
+
+    category_stats.record_changes(db, [
+        (
+            (row.category_id, row.is_active is not False, row.stock + requested[row.id], row.price),
+            (row.category_id, row.is_active is not False, row.stock, row.price),
         )
-        db.add(order_item)
-
-        # 📉 Deduct stock
-        product = db.query(Product).filter(Product.id == item_data["product_id"]).first()
-        product.stock -= item_data["quantity"]
-        db.add(product)
-
-    # 7️⃣ Link coupons
-    for coupon in coupons:
-        db_order.coupons.append(coupon)
-
+        for row in taken
+    ])
     db.commit()
 
-    # 8️⃣ Clear cart
-    db.query(CartItem).filter(CartItem.cart_id == cart.id).delete()
-    db.commit()
+    # Stock is part of the cached product payloads
+    catalog_cache.invalidate("products", *[f"product:{pid}" for pid in requested], "categories")
+    for pid, quantity in requested.items():
+        trending.tracker.record_sale(pid, quantity)
 
     db.refresh(db_order)
     return db_order
@@ -0,0 +1,224 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+
+import media_store
+import models
+from database import SessionLocal
+from response_cache import catalog_cache
+
+# image_pipeline.py
+# Product image processing off the request path.
+# Uploads land in media_store (content-addressed). The first upload of a blob
+# queues it here; decoding, thumbnailing and variant encoding run in a process
+# pool, and every product pointing at the blob gets its derived URLs (and
+# image_status "ready"/"failed") when the work finishes. Re-uploads of a blob
+# that is already processed reuse its results without touching Pillow.
+#
+# Besides the legacy thumbnail, every upload gets a responsive variant set:
+# each width in IMAGE_VARIANT_WIDTHS encoded as WebP (and AVIF when this Pillow
+# build can write it), named by a hash of the encoded bytes so the files never
+# change and can be cached forever. product.image_variants maps
+# format -> {"400w": url, ...}, ready to join into a srcset.
+
+THUMBNAIL_SIZE = (200, 200)  # pixels
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+VARIANT_WIDTHS = sorted(int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "200,400,800,1600").split(","))
+# format -> (Pillow format name, file extension, encoder options)
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "avif", {"quality": 50}),
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+}
+
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+# -------------------------------
+# Worker side (runs in the process pool)
+# -------------------------------
+def supported_formats() -> list:
+    """Variant formats this Pillow build can encode (AVIF needs Pillow 11.2+ or pillow-avif-plugin)."""
+    Image.init()
+    return [fmt for fmt, (pil_format, _, _) in VARIANT_FORMATS.items() if pil_format in Image.SAVE]
+
+
+def _write(image: Image.Image, out_dir: str, pil_format: str, ext: str, **options) -> str:
+    """Encode into out_dir under a name derived from the encoded bytes; returns the file name."""
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    data = buffer.getvalue()
+    filename = f"{hashlib.sha256(data).hexdigest()[:20]}.{ext}"
+    with open(f"{out_dir}/{filename}", "wb") as f:
+        f.write(data)
+    return filename
+
+
+def make_variants(image: Image.Image, out_dir: str) -> dict:
+    """{format: {"<width>w": file name}} for every configured width up to the original width."""
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    # Never upscale; an image narrower than the smallest width gets one variant at its own size
+    widths = [w for w in VARIANT_WIDTHS if w < image.width] + [min(image.width, VARIANT_WIDTHS[-1])]
+    variants = {fmt: {} for fmt in supported_formats()}
+    for width in sorted(set(widths)):
+        resized = image if width == image.width else image.resize(
+            (width, max(1, round(image.height * width / image.width))), Image.LANCZOS
+        )
+        for fmt in variants:
+            pil_format, ext, options = VARIANT_FORMATS[fmt]
+            variants[fmt][f"{width}w"] = _write(resized, out_dir, pil_format, ext, **options)
+    return variants
+
+
+def process_image(image_path: str, out_dir: str) -> dict:
+    """Thumbnail + variants of one source image, written as files into out_dir."""
+    with Image.open(image_path) as image:
+        pil_format = image.format
+        image = ImageOps.exif_transpose(image)
+        variants = make_variants(image, out_dir)
+        image.thumbnail(THUMBNAIL_SIZE)
+        ext = os.path.splitext(image_path)[1].lstrip(".") or pil_format.lower()
+        thumbnail = _write(image, out_dir, pil_format, ext)
+    return {"thumbnail": thumbnail, "variants": variants}
+
+
+# -------------------------------
+# App side
+# -------------------------------
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _pool
+
+
+def submit(blob: models.MediaBlob) -> Future:
+    work_dir = tempfile.mkdtemp(prefix="img-")
+    source = media_store.backend.local_path(blob.storage_key)
+    if source is None:
+        source = f"{work_dir}/source{os.path.splitext(blob.storage_key)[1]}"
+        media_store.backend.fetch(blob.storage_key, source)
+    out_dir = f"{work_dir}/out"
+    os.makedirs(out_dir)
+    blob_hash = blob.hash
+    future = _get_pool().submit(process_image, source, out_dir)
+    future.add_done_callback(lambda f: _on_done(blob_hash, work_dir, f))
+    return future
+
+
+def _store_outputs(blob_hash: str, out_dir: str, result: dict) -> dict:
+    """Move the worker's files into the media store; returns the value for blob.derived."""
+    keys = []
+
+    def store(filename):
+        key = media_store.derived_key(blob_hash, filename)
+        if key not in keys:
+            media_store.backend.put(key, f"{out_dir}/{filename}")
+            keys.append(key)
+        return media_store.backend.url(key)
+
+    return {
+        "thumbnail_url": store(result["thumbnail"]),
+        "image_variants": {
+            fmt: {width: store(name) for width, name in widths.items()}
+            for fmt, widths in result["variants"].items()
+        },
+        "keys": keys,
+    }
+
+
+def _on_done(blob_hash: str, work_dir: str, future: Future):
+    db = SessionLocal()
+    try:
+        blob = (
+            db.query(models.MediaBlob)
+            .filter(models.MediaBlob.hash == blob_hash)
+            .with_for_update()
+            .first()
+        )
+        if not blob:
+            return  # garbage-collected while processing; the outputs go with work_dir
+        try:
+            blob.derived = _store_outputs(blob_hash, f"{work_dir}/out", future.result())
+            blob.status = READY
+        except Exception as e:
+            print(f"Error processing image {blob_hash}: {e}")
+            blob.status = FAILED
+        # The blob row stays locked until commit, so attach() for a product
+        # committed after this point waits and then sees the final status.
+        product_ids = _apply(db, blob)
+        db.commit()
+        catalog_cache.invalidate("products", *[f"product:{pid}" for pid in product_ids])
+    finally:
+        db.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _apply(db: Session, blob: models.MediaBlob, product_id: Optional[int] = None) -> list:
+    """Copy the blob's status and derived URLs onto the products using it."""
+    derived = blob.derived or {}
+    query = db.query(models.Product).filter(models.Product.image_hash == blob.hash)
+    if product_id is not None:
+        query = query.filter(models.Product.id == product_id)
+    product_ids = [pid for (pid,) in query.with_entities(models.Product.id)]
+    query.update(
+        {
+            models.Product.image_status: blob.status,
+            models.Product.thumbnail_url: derived.get("thumbnail_url"),
+            models.Product.image_variants: derived.get("image_variants"),
+        },
+        synchronize_session=False,
+    )
+    return product_ids
+
+
+def attach(db: Session, product: models.Product, created: bool) -> models.Product:
+    """
+    Call once a product pointing at an uploaded blob is committed.
+    Reuses finished results, or queues processing for new (or previously failed) blobs.
+    """
+    blob = (
+        db.query(models.MediaBlob)
+        .filter(models.MediaBlob.hash == product.image_hash)
+        .with_for_update()
+        .one()
+    )
+    resubmit = created or blob.status == FAILED
+    if resubmit:
+        blob.status = PROCESSING
+    elif blob.status == READY:
+        _apply(db, blob, product.id)
+    db.commit()
+    if resubmit:
+        submit(blob)
+    catalog_cache.invalidate("products", f"product:{product.id}")
+    db.refresh(product)
+    return product
+
+
+def resume_pending():
+    """Re-queue images that were still processing when the last process stopped."""
+    db = SessionLocal()
+    try:
+        for blob in db.query(models.MediaBlob).filter(models.MediaBlob.status == PROCESSING).all():
+            submit(blob)
+    finally:
+        db.close()
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
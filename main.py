@@ -1,16 +1,27 @@
 from fastapi import FastAPI,APIRouter,Request, status,HTTPException
 from router import ( router_coupon,router_wishlist,router_payment,router_adress,router_cart,
                     router_category,router_order,router_product,router_review,router_user,route__auth,router_password)
-from database import engine, Base
+from database import engine, Base, SessionLocal
+import autocomplete
+import scheduler
+import trending
+import image_pipeline
+import media_server
+import scraper
+import media_store  # registers the orphan-blob sweeper with the scheduler
+import category_stats  # registers the reconcile job with the scheduler
+import cart_store  # registers the cart write-behind flusher with the scheduler
+import reservations  # registers the expired-hold sweeper with the scheduler
 from dotenv import load_dotenv
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 
 
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 # Load environment variables
 load_dotenv()
 
@@ -18,6 +29,39 @@ load_dotenv()
 Base.metadata.create_all(bind=engine)
 
 
+@app.on_event("startup")
+def build_autocomplete_index():
+    # Products, categories → in-memory prefix index for /products/autocomplete,
+    # product → image file map for /products/download/{id}
+    db = SessionLocal()
+    try:
+        autocomplete.index.build(db)
+        media_server.product_media.build(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def start_scheduled_jobs():
+    # Pick trending windows up where the last process left them
+    trending.tracker.restore()
+    scheduler.start()
+    # Thumbnails interrupted by the last shutdown
+    image_pipeline.resume_pending()
+
+
+@app.on_event("shutdown")
+def stop_scheduled_jobs():
+    # Runs the final flush of buffered counters
+    scheduler.stop()
+    image_pipeline.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await scraper.close()
+
+
 
 # ✅ Correct way to include router
 # 1️⃣ Authentication & Users (entry point)
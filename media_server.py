@@ -0,0 +1,177 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import Request, Response
+from fastapi.responses import RedirectResponse
+from sqlalchemy.orm import Session
+
+import models
+
+# media_server.py
+# Fast path behind GET /products/download/{id}.
+# Product -> image file is resolved from an in-memory map (built at startup,
+# filled on miss, dropped by crud.py when a product's image changes), so an
+# image fetch costs a stat() instead of a DB round trip. Responses carry
+# ETag / Last-Modified / Cache-Control, answer conditional requests with 304
+# and single byte ranges with 206. Bodies go out through the ASGI pathsend /
+# zerocopysend extensions when the server offers them (Granian, Hypercorn),
+# and through chunked reads otherwise (uvicorn).
+
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "3600"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class ProductMediaMap:
+    """product id -> (image_url, image_hash); None marks a product without an image."""
+
+    def __init__(self):
+        self._entries: Dict[int, Optional[Tuple[str, Optional[str]]]] = {}
+
+    def build(self, db: Session):
+        rows = (
+            db.query(models.Product.id, models.Product.image_url, models.Product.image_hash)
+            .filter(models.Product.image_url.isnot(None))
+            .all()
+        )
+        self._entries = {pid: (url, image_hash) for pid, url, image_hash in rows}
+
+    def get(self, db: Session, product_id: int) -> Optional[Tuple[str, Optional[str]]]:
+        if product_id not in self._entries:
+            row = (
+                db.query(models.Product.image_url, models.Product.image_hash)
+                .filter(models.Product.id == product_id)
+                .first()
+            )
+            # Unknown ids are not remembered, so the map cannot be grown by probing
+            if not row:
+                return None
+            self._entries[product_id] = (row.image_url, row.image_hash) if row.image_url else None
+        return self._entries[product_id]
+
+    def forget(self, *product_ids: int):
+        for product_id in product_ids:
+            self._entries.pop(product_id, None)
+
+
+product_media = ProductMediaMap()
+
+
+# -------------------------------
+# Conditional / range helpers
+# -------------------------------
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end inclusive) for a single satisfiable range; raises ValueError if unsatisfiable."""
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match:
+        return None  # multiple or malformed ranges: serve the whole file
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class MediaFileResponse(Response):
+    """A file (or one byte range of it) sent with zero-copy when the ASGI server allows."""
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, media_type: Optional[str] = None):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.count = end - start + 1
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope, receive, send):
+        extensions = scope.get("extensions") or {}
+        head_only = scope["method"].upper() == "HEAD"
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if head_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.pathsend" in extensions and self.start == 0 and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(), "offset": self.start, "count": self.count})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as f:
+                await f.seek(self.start)
+                remaining = self.count
+                while remaining:
+                    chunk = await f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break  # file shrank underneath us
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def serve(request: Request, path: str, image_hash: Optional[str]) -> Response:
+    """Raises FileNotFoundError when `path` is gone, so the caller can re-resolve it."""
+    if path.startswith(("http://", "https://")):
+        # Remote images (object storage, imported catalogs) are served by their host
+        return RedirectResponse(path, status_code=302)
+
+    stat = os.stat(path)
+    etag = f'"{image_hash}"' if image_hash else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    # ?v=<image_hash> URLs never change content, so they can be cached forever
+    versioned = image_hash and request.query_params.get("v") == image_hash
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": IMMUTABLE_CACHE_CONTROL if versioned else f"public, max-age={MEDIA_MAX_AGE}",
+        "accept-ranges": "bytes",
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    size = stat.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send it all
+    if range_header and size and (not if_range or if_range == etag or if_range == headers["last-modified"]):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            return MediaFileResponse(path, start, end, 206, headers, media_type)
+
+    return MediaFileResponse(path, 0, size - 1, 200, headers, media_type)
@@ -0,0 +1,289 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import models
+import scheduler
+from database import SessionLocal
+
+# media_store.py
+# Content-addressed storage for product media.
+# Uploads are hashed (SHA-256) while they stream to a temp file and stored once
+# under their hash, so re-uploading the same photo costs no storage and no
+# image processing, and two products uploading "image.jpg" never collide.
+# Every blob has a row in media_blobs with a reference count kept by crud.py;
+# when the last product lets go of a blob it is deleted with its derived files.
+#
+# Backends: MEDIA_BACKEND=local (default, files under MEDIA_ROOT) or s3
+# (needs boto3; MEDIA_S3_ENDPOINT_URL points it at MinIO or another
+# S3-compatible server, credentials come from the usual AWS_* variables).
+
+MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "local")
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "static/media")
+MEDIA_S3_BUCKET = os.getenv("MEDIA_S3_BUCKET")
+MEDIA_S3_ENDPOINT_URL = os.getenv("MEDIA_S3_ENDPOINT_URL")
+MEDIA_PUBLIC_URL = os.getenv("MEDIA_PUBLIC_URL")  # e.g. a CDN in front of the bucket
+MEDIA_GC_INTERVAL = float(os.getenv("MEDIA_GC_INTERVAL", "3600"))
+ORPHAN_GRACE = timedelta(hours=1)  # unreferenced blobs younger than this may still be attaching
+CHUNK_SIZE = 1024 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+class StorageBackend(ABC):
+    """Where blob bytes live. Keys are relative paths like "ab/ab12….jpg"."""
+
+    @abstractmethod
+    def put(self, key: str, src_path: str, content_type: Optional[str] = None):
+        """Store a local file under `key`; the source file is consumed."""
+
+    @abstractmethod
+    def fetch(self, key: str, dest_path: str):
+        """Copy the blob to a local file."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether a blob is stored under `key`."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove the blob; a missing key is not an error."""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """Where clients fetch the blob from."""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path on this machine when the backend is a filesystem, else None."""
+        return None
+
+
+class LocalBackend(StorageBackend):
+    def __init__(self, root: str = MEDIA_ROOT):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return f"{self.root}/{key}"
+
+    def put(self, key, src_path, content_type=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+
+    def fetch(self, key, dest_path):
+        shutil.copyfile(self._path(key), dest_path)
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        path = self._path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        # Drop the per-blob directory of derived files once it is empty
+        if key.count("/") > 1:
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def url(self, key):
+        return self._path(key)
+
+    def local_path(self, key):
+        return self._path(key)
+
+
+class S3Backend(StorageBackend):
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, public_url: Optional[str] = None):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("MEDIA_BACKEND=s3 needs boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("MEDIA_BACKEND=s3 needs MEDIA_S3_BUCKET")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.public_url = public_url
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._client_error = ClientError
+
+    def put(self, key, src_path, content_type=None):
+        extra = {"CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            extra["ContentType"] = content_type
+        self.client.upload_file(src_path, self.bucket, key, ExtraArgs=extra)
+        os.remove(src_path)
+
+    def fetch(self, key, dest_path):
+        self.client.download_file(self.bucket, key, dest_path)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def url(self, key):
+        if self.public_url:
+            return f"{self.public_url.rstrip('/')}/{key}"
+        if self.endpoint_url:
+            # Path-style addressing, which MinIO and most S3 stand-ins expect
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+
+def create_backend() -> StorageBackend:
+    if MEDIA_BACKEND == "local":
+        return LocalBackend()
+    if MEDIA_BACKEND == "s3":
+        return S3Backend(MEDIA_S3_BUCKET, MEDIA_S3_ENDPOINT_URL, MEDIA_PUBLIC_URL)
+    raise RuntimeError(f"Unknown MEDIA_BACKEND {MEDIA_BACKEND!r} (expected local or s3)")
+
+
+backend = create_backend()
+
+
+# -------------------------------
+# Blobs
+# -------------------------------
+def blob_key(blob_hash: str, ext: str) -> str:
+    return f"{blob_hash[:2]}/{blob_hash}{ext}"
+
+
+def derived_key(blob_hash: str, filename: str) -> str:
+    """Derived files (thumbnail, variants) live next to their source blob."""
+    return f"{blob_hash[:2]}/{blob_hash}/{filename}"
+
+
+def url(blob: models.MediaBlob) -> str:
+    return backend.url(blob.storage_key)
+
+
+def save_upload(db: Session, file: UploadFile) -> Tuple[models.MediaBlob, bool]:
+    return save_stream(db, file.file, file.filename, file.content_type)
+
+
+def save_stream(db: Session, stream: BinaryIO, filename: Optional[str], content_type: Optional[str]) -> Tuple[models.MediaBlob, bool]:
+    """
+    Stream bytes into the store. Returns (blob, created); created is False
+    when identical bytes were already stored, in which case nothing is written.
+    """
+    tmp_dir = f"{MEDIA_ROOT}/.tmp"  # same filesystem as MEDIA_ROOT, so LocalBackend.put is a rename
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        while chunk := stream.read(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+            tmp.write(chunk)
+    blob_hash = digest.hexdigest()
+    ext = os.path.splitext(filename or "")[1].lower()
+
+    try:
+        inserted = db.execute(
+            pg_insert(models.MediaBlob)
+            .values(
+                hash=blob_hash,
+                storage_key=blob_key(blob_hash, ext),
+                content_type=content_type,
+                size=size,
+                status="processing",
+            )
+            .on_conflict_do_nothing(index_elements=[models.MediaBlob.hash])
+            .returning(models.MediaBlob.hash)
+        ).scalar()
+        db.commit()
+        blob = db.query(models.MediaBlob).filter(models.MediaBlob.hash == blob_hash).one()
+        if inserted:
+            try:
+                backend.put(blob.storage_key, tmp.name, content_type)
+            except Exception:
+                db.delete(blob)
+                db.commit()
+                raise
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+    return blob, bool(inserted)
+
+
+def acquire(db: Session, blob_hash: Optional[str]):
+    """+1 reference; runs inside the caller's transaction."""
+    if blob_hash:
+        db.query(models.MediaBlob).filter(models.MediaBlob.hash == blob_hash).update(
+            {models.MediaBlob.ref_count: models.MediaBlob.ref_count + 1}, synchronize_session=False
+        )
+
+
+def release(db: Session, blob_hash: Optional[str]):
+    """-1 reference; runs inside the caller's transaction. Call collect() after the commit."""
+    if blob_hash:
+        db.query(models.MediaBlob).filter(models.MediaBlob.hash == blob_hash).update(
+            {models.MediaBlob.ref_count: models.MediaBlob.ref_count - 1}, synchronize_session=False
+        )
+
+
+def _delete_files(storage_key: str, derived: Optional[dict]):
+    for key in (derived or {}).get("keys", []) + [storage_key]:
+        try:
+            backend.delete(key)
+        except Exception as e:
+            print(f"⚠️  Could not delete media {key}: {e}")
+
+
+def collect(db: Session, blob_hash: Optional[str]) -> bool:
+    """Delete the blob and its files if nothing references it any more."""
+    if not blob_hash:
+        return False
+    row = db.execute(
+        models.MediaBlob.__table__.delete()
+        .where(models.MediaBlob.hash == blob_hash, models.MediaBlob.ref_count <= 0)
+        .returning(models.MediaBlob.storage_key, models.MediaBlob.derived)
+    ).first()
+    db.commit()
+    if row:
+        _delete_files(row.storage_key, row.derived)
+    return row is not None
+
+
+def collect_orphans(db: Session) -> int:
+    """Blobs uploaded but never attached (e.g. the product insert failed)."""
+    rows = db.execute(
+        models.MediaBlob.__table__.delete()
+        .where(models.MediaBlob.ref_count <= 0, models.MediaBlob.created_at < datetime.utcnow() - ORPHAN_GRACE)
+        .returning(models.MediaBlob.storage_key, models.MediaBlob.derived)
+    ).all()
+    db.commit()
+    for row in rows:
+        _delete_files(row.storage_key, row.derived)
+    return len(rows)
+
+
+@scheduler.every(MEDIA_GC_INTERVAL)
+def collect_orphans_job():
+    db = SessionLocal()
+    try:
+        collect_orphans(db)
+    finally:
+        db.close()
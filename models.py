@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, UniqueConstraint,JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, UniqueConstraint,JSON, Index
+from sqlalchemy import Computed, DDL, event, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from sqlalchemy import Table
 from database import Base
@@ -15,7 +17,8 @@ import uuid
 order_coupons = Table(
     'order_coupons', Base.metadata,
     Column('order_id', Integer, ForeignKey('orders.id')),
-    Column('coupon_id', Integer, ForeignKey('coupons.id'))
+    Column('coupon_id', Integer, ForeignKey('coupons.id')),
+    Index('ix_order_coupons_order_id', 'order_id'),
 )
 
 # Coupon model for discounts
@@ -42,6 +45,12 @@ class Wishlist(Base):
     user = relationship('User')
     product = relationship('Product')
 
+    __table_args__ = (
+        # (user_id, product_id) serves both the user's list and the duplicate check
+        Index('ix_wishlists_user_id_product_id', 'user_id', 'product_id'),
+        Index('ix_wishlists_product_id', 'product_id'),
+    )
+
     # Users can add products to their wishlist
 
 # PaymentMethod model for storing user payment optionsclass PaymentOption(Base):
@@ -93,6 +102,8 @@ class Address(Base):
 
     user = relationship('User', back_populates='addresses')
 
+    __table_args__ = (Index('ix_addresses_user_id', 'user_id'),)
+
     # Stores user shipping/billing addresses
 
 class Category(Base):
@@ -104,9 +115,36 @@ class Category(Base):
 
     parent = relationship("Category", remote_side=[id], backref="subcategories")
     products = relationship("Product", back_populates="category")
+    stats = relationship("CategoryStats", uselist=False, viewonly=True)
     # Categories help organize products
 
 
+# Closure table for the category tree: one row per (ancestor, descendant) pair,
+# including each category paired with itself at depth 0. Maintained by the
+# category CRUD functions so a whole subtree is one indexed lookup.
+class CategoryClosure(Base):
+    __tablename__ = 'category_closure'
+    ancestor_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('ix_category_closure_descendant_id', 'descendant_id'),
+    )
+
+
+# Navigation badge aggregates per category (active products only), maintained
+# incrementally by category_stats.py
+class CategoryStats(Base):
+    __tablename__ = 'category_stats'
+    category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0, server_default='0')
+    in_stock_count = Column(Integer, nullable=False, default=0, server_default='0')
+    min_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Product(Base):
     __tablename__ = 'products'
     id = Column(Integer, primary_key=True)
@@ -116,15 +154,77 @@ class Product(Base):
     stock = Column(Integer, default=0)
     image_url = Column(String(255))
     thumbnail_url = Column(String, nullable=True)
+    image_status = Column(String(20), nullable=True)  # processing / ready / failed, None without an image
+    image_variants = Column(JSON, nullable=True)  # {"webp": {"400w": path, ...}, "avif": {...}}
+    image_hash = Column(String(64), ForeignKey('media_blobs.hash'), nullable=True, index=True)  # uploaded image (media_store)
     category_id = Column(Integer, ForeignKey('categories.id'))
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)  # <-- soft delete flag
 
+    # 📈 Denormalized counters behind /products/top (sales from checkout, views from product_stats)
+    sales_count = Column(Integer, nullable=False, default=0, server_default='0')
+    view_count = Column(Integer, nullable=False, default=0, server_default='0')
+
+    # ⏳ Units held by unpaid orders (stock_reservations). Checkout moves units from
+    # stock into reserved_stock, so stock stays the available-to-sell figure and
+    # stock + reserved_stock is what is on hand.
+    reserved_stock = Column(Integer, nullable=False, default=0, server_default='0')
+
+    # 🔍 Full-text document maintained by Postgres; name (A) outranks description (B).
+    # Deferred so it is never loaded into (or serialized from) regular product queries.
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+
+    __table_args__ = (
+        # ✅ Keyset pagination of /categories/{id}/products seeks on (category_id, id)
+        Index('ix_products_category_id_id', 'category_id', 'id'),
+        Index('ix_products_search_vector', 'search_vector', postgresql_using='gin'),
+        # 🔤 Trigram index backing typo-tolerant (fuzzy) name search
+        Index('ix_products_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # 🏆 /products/top?sort_by=sales|views walks these backwards
+        Index('ix_products_sales_count_id', 'sales_count', 'id'),
+        Index('ix_products_view_count_id', 'view_count', 'id'),
+        # 📦 Bulk import matches incoming rows to existing products by name
+        Index('ix_products_name', 'name'),
+        # 💰 Price filters within a category and category_stats' min/max, over active products only
+        Index(
+            'ix_products_active_category_id_price', 'category_id', 'price',
+            postgresql_where=text('is_active IS NOT false'),
+        ),
+    )
+
     category = relationship('Category', back_populates='products')
     order_items = relationship('OrderItem', back_populates='product')
     reviews = relationship('Review', back_populates='product')
 
     # Products belong to a category and can have reviews
+
+class MediaBlob(Base):
+    __tablename__ = 'media_blobs'
+    hash = Column(String(64), primary_key=True)  # SHA-256 of the bytes
+    storage_key = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default='0')  # products using it
+    status = Column(String(20), nullable=False, default='processing')  # image pipeline status
+    derived = Column(JSON, nullable=True)  # thumbnail_url, image_variants and their storage keys
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Content-addressed product media, shared by every product uploading the same bytes
+
+# gin_trgm_ops needs pg_trgm before create_all builds the products table
+event.listen(
+    Product.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 class Order(Base):
     __tablename__ = 'orders'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -150,6 +250,12 @@ class Order(Base):
     coupons = relationship('Coupon', secondary=order_coupons, backref='orders')
     payment_option = relationship('PaymentOption')  # 🔹 link to PaymentOption
 
+    __table_args__ = (
+        # /orders/user, newest first
+        Index('ix_orders_user_id_created_at', 'user_id', 'created_at'),
+        Index('ix_orders_address_id', 'address_id'),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = 'order_items'
@@ -166,9 +272,33 @@ class OrderItem(Base):
     order = relationship('Order', back_populates='items')
     product = relationship('Product', back_populates='order_items')
 
+    __table_args__ = (
+        Index('ix_order_items_order_id', 'order_id'),
+        Index('ix_order_items_product_id', 'product_id'),
+    )
+
     def __repr__(self):
         return f"<OrderItem Product {self.product_id} | Qty {self.quantity} | Price {self.price}>"
 
+
+class StockReservation(Base):
+    # One hold per order line while the order is unpaid (see reservations.py)
+    __tablename__ = 'stock_reservations'
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_stock_reservations_order_id', 'order_id'),
+        Index('ix_stock_reservations_product_id', 'product_id'),
+        # the sweeper scans for expired holds
+        Index('ix_stock_reservations_expires_at', 'expires_at'),
+    )
+
 class Review(Base):
     __tablename__ = 'reviews'
     id = Column(Integer, primary_key=True)
@@ -181,6 +311,11 @@ class Review(Base):
     user = relationship('User', back_populates='reviews')
     product = relationship('Product', back_populates='reviews')
 
+    __table_args__ = (
+        Index('ix_reviews_product_id', 'product_id'),
+        Index('ix_reviews_user_id', 'user_id'),
+    )
+
     # Users can leave reviews for products
 
 
@@ -190,6 +325,10 @@ class Cart(Base):
     user_id = Column(Integer, ForeignKey('users.id'))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # 🧮 Running totals, moved by every item add/update/remove (crud.bump_cart_totals)
+    subtotal = Column(Float, nullable=False, default=0.0, server_default='0')
+    item_count = Column(Integer, nullable=False, default=0, server_default='0')  # total quantity
+
     # ✅ Ensure one cart per user
     __table_args__ = (UniqueConstraint('user_id', name='unique_user_cart'),)
 
@@ -210,5 +349,11 @@ class CartItem(Base):
     cart = relationship('Cart', back_populates='items')
     product = relationship('Product')
 
+    __table_args__ = (
+        # ✅ One line per product; adding again merges quantities (crud.add_cart_items)
+        UniqueConstraint('cart_id', 'product_id', name='uq_cart_items_cart_id_product_id'),
+        Index('ix_cart_items_product_id', 'product_id'),
+    )
+
 
 
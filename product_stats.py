@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import Counter
+
+from sqlalchemy import Integer, column, update, values
+from sqlalchemy.orm import Session
+
+import models
+import scheduler
+from database import SessionLocal
+
+# product_stats.py
+# Buffered product view counter.
+# GET /products/{id} only bumps an in-memory counter; a scheduled job folds the
+# buffer into products.view_count with one UPDATE ... FROM (VALUES ...) per
+# batch instead of one write per page view.
+
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "10"))
+VIEW_FLUSH_BATCH = 1000
+
+_lock = threading.Lock()
+_pending_views = Counter()
+
+
+def record_view(product_id: int):
+    with _lock:
+        _pending_views[product_id] += 1
+
+
+def flush_views(db: Session) -> int:
+    """Write buffered views to the database; returns the number of products updated."""
+    global _pending_views
+    with _lock:
+        pending, _pending_views = _pending_views, Counter()
+    if not pending:
+        return 0
+
+    rows = list(pending.items())
+    try:
+        for start in range(0, len(rows), VIEW_FLUSH_BATCH):
+            batch = values(column("id", Integer), column("views", Integer), name="v").data(
+                rows[start:start + VIEW_FLUSH_BATCH]
+            )
+            db.execute(
+                update(models.Product)
+                .where(models.Product.id == batch.c.id)
+                .values(view_count=models.Product.view_count + batch.c.views)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Put the counts back so the next flush retries them
+        with _lock:
+            _pending_views.update(pending)
+        raise
+    return len(rows)
+
+
+@scheduler.every(VIEW_FLUSH_INTERVAL, run_on_shutdown=True)
+def flush_views_job():
+    db = SessionLocal()
+    try:
+        flush_views(db)
+    finally:
+        db.close()
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+import bulk_import
+from database import SessionLocal
+
+# remote_import.py
+# Async importer for the DummyJSON catalog (or anything serving the same JSON).
+# Category pages are fetched concurrently through one pooled httpx client
+# behind a semaphore, with timeouts and retries. Products stream to a single
+# writer that hands batches to bulk_import.upsert_batch in a worker thread.
+# Runs as a background job; progress is kept in `jobs` for the status endpoint.
+# Point DUMMYJSON_BASE_URL at a local server to run it without the internet.
+
+DUMMYJSON_BASE_URL = os.getenv("DUMMYJSON_BASE_URL", "https://dummyjson.com")
+CONCURRENCY = int(os.getenv("REMOTE_IMPORT_CONCURRENCY", "8"))
+TIMEOUT_SECONDS = float(os.getenv("REMOTE_IMPORT_TIMEOUT", "10"))
+RETRIES = 3
+PAGE_SIZE = 100
+MAX_REPORTED_ERRORS = 100
+
+jobs: Dict[str, dict] = {}
+
+
+def create_job() -> dict:
+    """Register a queued job, or return the one already queued/running."""
+    for job in jobs.values():
+        if job["status"] in ("queued", "running"):
+            return job
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "categories_total": 0,
+        "categories_done": 0,
+        "products_fetched": 0,
+        "inserted": 0,
+        "updated": 0,
+        "failed": 0,
+        "errors": [],
+        "error": None,
+        "created_at": datetime.utcnow(),
+        "finished_at": None,
+    }
+    jobs[job["id"]] = job
+    return job
+
+
+async def fetch_json(client: httpx.AsyncClient, url: str, params: Optional[dict] = None):
+    """GET with retries on network errors, 429 and 5xx (exponential backoff)."""
+    for attempt in range(RETRIES + 1):
+        try:
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            if attempt == RETRIES or (e.response.status_code != 429 and e.response.status_code < 500):
+                raise
+        except httpx.TransportError:
+            if attempt == RETRIES:
+                raise
+        await asyncio.sleep(0.5 * 2 ** attempt)
+
+
+def to_row(product: dict, category_name: str) -> dict:
+    images = product.get("images") or []
+    return {
+        "name": product.get("title"),
+        "description": product.get("description"),
+        "price": product.get("price"),
+        "stock": product.get("stock"),
+        "image_url": images[0] if images else None,
+        "thumbnail_url": product.get("thumbnail"),
+        "category": category_name,
+    }
+
+
+async def fetch_category(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, slug: str) -> List[dict]:
+    """All products of one category; pages after the first are fetched concurrently."""
+    url = f"/products/category/{slug}"
+    async with semaphore:
+        first = await fetch_json(client, url, {"limit": PAGE_SIZE, "skip": 0})
+    products = list(first.get("products", []))
+    total = first.get("total", len(products))
+
+    async def page(skip: int):
+        async with semaphore:
+            return (await fetch_json(client, url, {"limit": PAGE_SIZE, "skip": skip})).get("products", [])
+
+    rest = await asyncio.gather(*[page(skip) for skip in range(len(products), total, PAGE_SIZE)]) if products else []
+    for chunk in rest:
+        products.extend(chunk)
+    return products
+
+
+def write_rows(db: Session, categories: bulk_import.CategoryResolver, rows: List[dict], job: dict):
+    valid = []
+    for row in rows:
+        try:
+            valid.append(bulk_import.validate_row(row, categories))
+        except (ValueError, TypeError, ValidationError) as e:
+            job["failed"] += 1
+            if len(job["errors"]) < MAX_REPORTED_ERRORS:
+                job["errors"].append({"product": row.get("name"), "error": str(e)})
+    if valid:
+        try:
+            inserted, updated = bulk_import.upsert_batch(db, valid)
+        except Exception:
+            db.rollback()
+            raise
+        job["inserted"] += inserted
+        job["updated"] += updated
+
+
+async def run_import(job: dict, base_url: str = DUMMYJSON_BASE_URL, batch_size: int = bulk_import.BATCH_SIZE):
+    job["status"] = "running"
+    db = SessionLocal()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CONCURRENCY * 2)
+    try:
+        categories = await asyncio.to_thread(bulk_import.CategoryResolver, db)
+        limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+        async with httpx.AsyncClient(base_url=base_url, timeout=TIMEOUT_SECONDS, limits=limits) as client:
+            remote_categories = await fetch_json(client, "/products/categories")
+            job["categories_total"] = len(remote_categories)
+            semaphore = asyncio.Semaphore(CONCURRENCY)
+
+            async def producer(cat):
+                # Older API versions return plain slugs instead of objects
+                name = cat["name"] if isinstance(cat, dict) else cat
+                slug = cat["slug"] if isinstance(cat, dict) else cat
+                try:
+                    products = await fetch_category(client, semaphore, slug)
+                    await queue.put([to_row(p, name) for p in products])
+                except (httpx.HTTPError, ValueError) as e:
+                    if len(job["errors"]) < MAX_REPORTED_ERRORS:
+                        job["errors"].append({"category": slug, "error": str(e)})
+                finally:
+                    job["categories_done"] += 1
+
+            async def writer():
+                pending: List[dict] = []
+                error = None
+                while True:
+                    rows = await queue.get()
+                    if rows is None:
+                        break
+                    if error:
+                        continue  # keep draining so producers never block on a dead writer
+                    job["products_fetched"] += len(rows)
+                    pending.extend(rows)
+                    if len(pending) >= batch_size:
+                        try:
+                            await asyncio.to_thread(write_rows, db, categories, pending, job)
+                        except Exception as e:
+                            error = e
+                        pending = []
+                if error:
+                    raise error
+                if pending:
+                    await asyncio.to_thread(write_rows, db, categories, pending, job)
+
+            writer_task = asyncio.create_task(writer())
+            producers = [asyncio.create_task(producer(cat)) for cat in remote_categories]
+            try:
+                await asyncio.gather(*producers)
+            finally:
+                # If a producer blew up: stop the rest, then let the writer drain what it
+                # has (it owns the session, so it is not cancelled mid-batch)
+                for task in producers:
+                    task.cancel()
+                await asyncio.gather(*producers, return_exceptions=True)
+                await queue.put(None)
+                await writer_task
+
+        job["status"] = "completed"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        if job["status"] == "running":  # cancelled
+            job["status"] = "failed"
+            job["error"] = job["error"] or "Import was cancelled"
+        job["finished_at"] = datetime.utcnow()
+        db.close()
+    return job
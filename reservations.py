@@ -0,0 +1,158 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, column, delete, func, insert, select, update, values
+from sqlalchemy.orm import Session
+
+import category_stats
+import models
+import scheduler
+from database import SessionLocal
+from response_cache import catalog_cache
+
+# reservations.py
+# Time-limited stock holds for unpaid orders. crud.checkout_cart moves the
+# ordered units from products.stock to products.reserved_stock in its single
+# UPDATE and records one hold per line here with an expiry. A confirmed payment
+# converts the holds (the units are sold: reserved_stock drops, stock stays
+# down); cancelling or rejecting the order releases them (the units go back to
+# stock). A scheduled sweeper cancels orders whose holds expired unpaid and
+# releases their stock in batches, one DELETE and one UPDATE per batch.
+#
+# products.stock therefore stays the available-to-sell figure every stock check
+# already reads, and nothing sums holds per request. Order rows are locked before
+# product rows everywhere (products in id order), so the sweeper, payments and
+# cancellations cannot deadlock with each other or with checkout.
+
+RESERVATION_TTL = int(os.getenv("RESERVATION_TTL", str(30 * 60)))  # card payments (Paystack)
+MANUAL_RESERVATION_TTL = int(os.getenv("MANUAL_RESERVATION_TTL", str(48 * 3600)))  # bank transfers an admin confirms
+SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "60"))
+SWEEP_BATCH = 200  # orders per transaction
+
+holds = models.StockReservation.__table__
+products = models.Product.__table__
+orders = models.Order.__table__
+
+
+def hold(db: Session, order_id: int, quantities: Dict[int, int], ttl: Optional[int] = None):
+    """Record holds for units the caller already moved from stock to reserved_stock."""
+    expires_at = datetime.utcnow() + timedelta(seconds=RESERVATION_TTL if ttl is None else ttl)
+    db.execute(insert(holds), [
+        {"order_id": order_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def _take(db: Session, order_ids: List[int]) -> Tuple[Counter, Set[int]]:
+    """Delete the orders' holds; (product_id → units they held, ids of the orders that held any)."""
+    rows = db.execute(
+        delete(holds)
+        .where(holds.c.order_id.in_(order_ids))
+        .returning(holds.c.order_id, holds.c.product_id, holds.c.quantity)
+    ).all()
+    held = Counter()
+    for _, product_id, quantity in rows:
+        held[product_id] += quantity
+    return held, {row.order_id for row in rows}
+
+
+def _adjust(db: Session, held: Counter, unreserve: bool, restock: bool):
+    # One UPDATE ... FROM (VALUES ...) for all products, locked in id order first
+    db.execute(select(products.c.id).where(products.c.id.in_(list(held))).order_by(products.c.id).with_for_update())
+    units = values(column("id", Integer), column("qty", Integer), name="held").data(sorted(held.items()))
+    changes = {}
+    if unreserve:
+        changes["reserved_stock"] = products.c.reserved_stock - units.c.qty
+    if restock:
+        # Back on sale, and no longer a sale for /products/top
+        changes["stock"] = products.c.stock + units.c.qty
+        changes["sales_count"] = func.greatest(products.c.sales_count - units.c.qty, 0)
+    return db.execute(
+        update(products)
+        .where(products.c.id == units.c.id)
+        .values(**changes)
+        .returning(products.c.id, products.c.category_id, products.c.is_active, products.c.stock, products.c.price)
+    ).all()
+
+
+def convert(db: Session, order_id: int) -> bool:
+    """The order was paid: its held units are sold. False if it held nothing (already converted, released or pre-dating holds)."""
+    held, _ = _take(db, [order_id])
+    if held:
+        _adjust(db, held, unreserve=True, restock=False)
+    return bool(held)
+
+
+def release(db: Session, order_ids: Iterable[int]) -> Counter:
+    """
+    Put the orders' held units back on sale; product_id → units released (empty
+    if they held nothing). The caller commits and then calls invalidate().
+    """
+    return _release(db, list(order_ids))[0]
+
+
+def _release(db: Session, order_ids: List[int]) -> Tuple[Counter, Set[int]]:
+    held, holders = _take(db, order_ids)
+    if held:
+        _record_restock(db, held, _adjust(db, held, unreserve=True, restock=True))
+    return held, holders
+
+
+def restock(db: Session, units: Counter):
+    """Put sold units (product_id → quantity) back on sale, e.g. for a cancelled paid order. The caller commits."""
+    if units:
+        _record_restock(db, units, _adjust(db, units, unreserve=False, restock=True))
+
+
+def _record_restock(db: Session, units: Counter, rows):
+    category_stats.record_changes(db, [
+        (
+            (row.category_id, row.is_active is not False, row.stock - units[row.id], row.price),
+            (row.category_id, row.is_active is not False, row.stock, row.price),
+        )
+        for row in rows
+    ])
+
+
+def invalidate(held: Counter):
+    """Stock is part of the cached product payloads and category badges."""
+    if held:
+        catalog_cache.invalidate("products", *[f"product:{product_id}" for product_id in held], "categories")
+
+
+def expire(db: Session, limit: int = SWEEP_BATCH) -> Tuple[List[int], Counter]:
+    """Cancel up to `limit` unpaid orders whose holds have expired and release their stock."""
+    expired = select(holds.c.order_id).where(holds.c.expires_at <= datetime.utcnow())
+    order_ids = db.execute(
+        select(orders.c.id)
+        .where(orders.c.id.in_(expired))
+        .order_by(orders.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)  # a payment or cancellation holding the order wins
+    ).scalars().all()
+    if not order_ids:
+        return [], Counter()
+
+    # Only orders that still had holds: one paid between our snapshot and its row
+    # lock was converted (holds gone) and must not be cancelled
+    held, holders = _release(db, order_ids)
+    expired_ids = sorted(holders)
+    if expired_ids:
+        db.execute(update(orders).where(orders.c.id.in_(expired_ids)).values(status="cancelled", payment_status="expired"))
+    return expired_ids, held
+
+
+@scheduler.every(SWEEP_INTERVAL)
+def sweep_job():
+    db = SessionLocal()
+    try:
+        while True:
+            order_ids, held = expire(db)
+            db.commit()
+            invalidate(held)
+            if not order_ids:
+                break
+    finally:
+        db.close()
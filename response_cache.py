@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Union
+
+import orjson
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# response_cache.py
+# Serialized-response cache for the read-mostly catalog endpoints.
+# Bodies are stored already encoded, keyed by path + query string, and tagged
+# ("products", "product:<id>", "categories") so crud.py can drop exactly the
+# entries a write affects. Clients revalidate with If-None-Match → 304.
+
+CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+
+
+class ResponseCache:
+    """LRU of encoded response bodies with a TTL and tag-based invalidation."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (body, etag, expires_at, tags)
+        self._tags = {}                 # tag -> set of keys
+        # Bumped on every invalidation; a body built before the bump is not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: str, body: bytes, etag: str, tags: Iterable[str], generation: int):
+        tags = tuple(tags)
+        with self._lock:
+            if generation != self.generation:
+                return  # a write landed while this body was being built
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, etag, time.monotonic() + self.ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "bytes": sum(len(entry[0]) for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key: str):
+        body, etag, expires_at, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+catalog_cache = ResponseCache()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def cached_response(request: Request, tags: Iterable[str], build: Callable[[], Union[Response, dict]]) -> Response:
+    """
+    Serve `build()` through the catalog cache.
+    `build` only runs on a miss, so a hit never touches the database or re-encodes ORM objects.
+    """
+    query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+    key = f"{request.url.path}?{query}"
+
+    entry = catalog_cache.get(key)
+    if entry is not None:
+        body, etag = entry[0], entry[1]
+        status = "HIT"
+    else:
+        generation = catalog_cache.generation
+        result = build()
+        # Routers hand back ready-encoded envelopes (serialization.envelope); plain dicts are encoded here
+        body = result.body if isinstance(result, Response) else orjson.dumps(jsonable_encoder(result))
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        catalog_cache.set(key, body, etag, tags, generation)
+        status = "MISS"
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": status}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
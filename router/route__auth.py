@@ -14,6 +14,7 @@ import crud
 import models, schemas, database
 from auth import authenticate_user, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES, generate_verification_code, create_email_token, decode_email_token
 from email_utilis import send_verification_email
+import serialization
 
 load_dotenv()
 
@@ -27,8 +28,8 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
 
 
 # ---------------------- Register ----------------------
@@ -4,11 +4,12 @@ import schemas, crud
 from database import get_db
 from roles import get_current_user
 from models import User
+import serialization
 
 router = APIRouter(prefix="/addresses", tags=["Addresses"])
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
 
 # ===============================
 # Create Address (Authenticated User Only)
@@ -20,7 +21,7 @@ def create_address(
     current_user: User = Depends(get_current_user)
 ):
     db_address = crud.create_address(db, address, current_user.id)
-    return response_format(db_address, "Address created successfully")
+    return response_format(db_address, "Address created successfully", schema=schemas.AddressOut)
 
 # ===============================
 # Get All Addresses (Authenticated User Only)
@@ -31,7 +32,7 @@ def get_my_addresses(
     current_user: User = Depends(get_current_user)
 ):
     db_addresses = crud.get_addresses(db, current_user.id)
-    return response_format(db_addresses, "User addresses retrieved successfully")
+    return response_format(db_addresses, "User addresses retrieved successfully", schema=schemas.AddressOut)
 
 # ===============================
 # Get Single Address (Only if owner)
@@ -47,7 +48,7 @@ def get_address(
         raise HTTPException(status_code=404, detail="Address not found")
     if db_address.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed to view this address")
-    return response_format(db_address, "Address retrieved successfully")
+    return response_format(db_address, "Address retrieved successfully", schema=schemas.AddressOut)
 
 # ===============================
 # Update Address (Only if owner)
@@ -66,7 +67,7 @@ def update_address(
         raise HTTPException(status_code=403, detail="Not allowed to update this address")
 
     updated_address = crud.update_address(db, address_id, address)
-    return response_format(updated_address, "Address updated successfully")
+    return response_format(updated_address, "Address updated successfully", schema=schemas.AddressOut)
 
 # ===============================
 # Delete Address (Only if owner)
@@ -84,4 +85,4 @@ def delete_address(
         raise HTTPException(status_code=403, detail="Not allowed to delete this address")
 
     deleted_address = crud.delete_address(db, address_id)
-    return response_format(deleted_address, "Address deleted successfully")
+    return response_format(deleted_address, "Address deleted successfully", schema=schemas.AddressOut)
@@ -4,11 +4,13 @@ import schemas, crud
 from auth import get_current_user
 from database import get_db
 import models
+import cart_store
+import serialization
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
 
 # ---------------------------
 # Get Current User Cart
@@ -18,10 +20,7 @@ def get_cart_by_current_user(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    db_cart = crud.get_cart(db, current_user.id)
-    if not db_cart:
-        db_cart = crud.create_cart(db, schemas.CartCreate(user_id=current_user.id))
-    return crud.format_cart(db_cart)
+    return crud.format_cart(cart_store.store.get_cart(db, current_user.id))
 
 # ---------------------------
 # Add Item to Cart
@@ -32,9 +31,20 @@ def add_item_to_cart(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    db_cart = crud.get_cart(db, current_user.id) or crud.create_cart(db, schemas.CartCreate(user_id=current_user.id))
-    db_item = crud.add_cart_item(db, db_cart.id, item)  # merges quantity if exists
-    return response_format(db_item, "Item added to cart successfully")
+    db_item, = cart_store.store.add_items(db, current_user.id, [item])  # merges quantity if exists
+    return response_format(db_item, "Item added to cart successfully", schema=schemas.CartItemOut)
+
+# ---------------------------
+# Add Several Items at Once
+# ---------------------------
+@router.post("/items/batch")
+def add_items_to_cart(
+    batch: schemas.CartItemBatch,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    db_items = cart_store.store.add_items(db, current_user.id, batch.items)
+    return response_format(db_items, f"{len(db_items)} items added to cart successfully", schema=schemas.CartItemOut)
 
 # ---------------------------
 # Merge Guest Cart
@@ -45,37 +55,44 @@ def merge_guest_cart(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    db_cart = crud.get_cart(db, current_user.id) or crud.create_cart(db, schemas.CartCreate(user_id=current_user.id))
-    merged_items = [crud.add_cart_item(db, db_cart.id, item) for item in items]
+    cart_store.store.add_items(db, current_user.id, items)
+    db_cart = cart_store.store.get_cart(db, current_user.id)
     return response_format(crud.format_cart(db_cart), "Guest cart merged successfully")
 
 # ---------------------------
 # Update Cart Item Quantity
 # ---------------------------
 @router.put("/items/{item_id}")
-def update_cart_item(item_id: int, item: schemas.CartItemUpdate, db: Session = Depends(get_db)):
-    db_item = crud.update_cart_item(db, item_id, item)
+def update_cart_item(
+    item_id: int,
+    item: schemas.CartItemUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    db_item = cart_store.store.update_item(db, current_user.id, item_id, item)
     if not db_item:
         raise HTTPException(status_code=404, detail="Cart item not found or removed")
-    return response_format(db_item, "Cart item updated successfully")
+    return response_format(db_item, "Cart item updated successfully", schema=schemas.CartItemOut)
 
 # ---------------------------
 # Remove Cart Item
 # ---------------------------
 @router.delete("/items/{item_id}")
-def remove_cart_item(item_id: int, db: Session = Depends(get_db)):
-    db_item = crud.remove_cart_item(db, item_id)
+def remove_cart_item(
+    item_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    db_item = cart_store.store.remove_item(db, current_user.id, item_id)
     if not db_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
-    return response_format(db_item, "Cart item removed successfully")
+    return response_format(db_item, "Cart item removed successfully", schema=schemas.CartItemOut)
 
 # ---------------------------
 # Clear Entire Cart
 # ---------------------------
 @router.delete("/clear")
 def clear_cart_route(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    db_cart = crud.get_cart(db, current_user.id)
-    if not db_cart:
+    if not cart_store.store.clear(db, current_user.id):
         raise HTTPException(status_code=404, detail="Cart not found")
-    crud.clear_cart(db, db_cart.id)
     return response_format(None, "Cart cleared successfully")
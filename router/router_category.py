@@ -1,41 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
+from typing import Optional
 import schemas, crud, models
 from database import get_db
 from roles import require_role  # your role dependency
+from response_cache import cached_response
+import serialization
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, pagination=None, schema=None, status_code=200):
+    extra = {"pagination": pagination} if pagination is not None else {}
+    return serialization.envelope(data, message, success, schema, status_code, **extra)
 
 # ---------------------- Create Category ----------------------
 @router.post("/")
 def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db), 
                     current_user: models.User = Depends(require_role("admin", "superadmin"))):
     db_category = crud.create_category(db, category)
-    return response_format(db_category, "Category created successfully")
+    return response_format(db_category, "Category created successfully", schema=schemas.CategoryOut)
 
 # ---------------------- Get Category by ID ----------------------
 # ---------------------- Get Products by Category ID ----------------------
 @router.get("/{category_id}/products")
-def get_products_by_category(category_id: int, db: Session = Depends(get_db)):
+def get_products_by_category(
+    category_id: int,
+    limit: int = Query(20, ge=1, le=100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's next_cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,name,price,thumbnail_url (default: all)"),
+    include_descendants: bool = Query(False, description="Also return products of every subcategory"),
+    db: Session = Depends(get_db)
+):
+    selected = crud.parse_fields(fields, crud.PRODUCT_FIELDS)
+
     # Check if category exists
     db_category = crud.get_category(db, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    # Get products in that category
-    products = db.query(models.Product).filter(models.Product.category_id == category_id).all()
+    # Get one page of products in that category
+    products, next_cursor = crud.get_products_by_category(
+        db, category_id, limit=limit, cursor=cursor, fields=selected,
+        include_descendants=include_descendants
+    )
 
-    return response_format(products, f"Products in category {db_category.name} retrieved successfully")
+    return response_format(
+        products,
+        f"Products in category {db_category.name} retrieved successfully",
+        pagination={"limit": limit, "count": len(products), "next_cursor": next_cursor},
+        schema=schemas.ProductOut
+    )
 
 
 # ---------------------- Get All Categories ----------------------
 @router.get("/", )
-def get_categories(db: Session = Depends(get_db)):
-    db_categories = crud.get_categories(db)
-    return response_format(db_categories, "All categories retrieved successfully")
+def get_categories(request: Request, db: Session = Depends(get_db)):
+    def build():
+        db_categories = crud.get_categories(db)
+        return response_format(db_categories, "All categories retrieved successfully", schema=schemas.CategoryOut)
+
+    return cached_response(request, ["categories"], build)
+
+# ---------------------- Category Tree ----------------------
+@router.get("/tree")
+def get_category_tree(request: Request, db: Session = Depends(get_db)):
+    def build():
+        tree = crud.get_category_tree(db)
+        return response_format(tree, "Category tree retrieved successfully", schema=schemas.CategoryTreeOut)
+
+    return cached_response(request, ["categories"], build)
 
 # ---------------------- Update Category ----------------------
 @router.put("/{category_id}")
@@ -44,7 +77,7 @@ def update_category(category_id: int, category: schemas.CategoryUpdate, db: Sess
     db_category = crud.update_category(db, category_id, category)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return response_format(db_category, "Category updated successfully")
+    return response_format(db_category, "Category updated successfully", schema=schemas.CategoryOut)
 
 # ---------------------- Delete Category ----------------------
 @router.delete("/{category_id}")
@@ -52,5 +85,5 @@ def delete_category(category_id: int, db: Session = Depends(get_db),
                     current_user: models.User = Depends(require_role("superadmin"))):
     db_category = crud.delete_category(db, category_id)
     if not db_category:
-        raise HTTPException(status_code=404, detail="Category not found or has products")
-    return response_format(db_category, "Category deleted successfully")
+        raise HTTPException(status_code=404, detail="Category not found or has products or subcategories")
+    return response_format(db_category, "Category deleted successfully", schema=schemas.CategoryOut)
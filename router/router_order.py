@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from sqlalchemy.orm import Session
+from typing import Optional
 import schemas, crud, models
 from database import get_db
 from roles import get_current_user, require_role  # 🔒 add admin role check
 from models import User, Address, PaymentOption
 from email_utilis import send_order_email
+import cart_store
+import reservations
+import serialization
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
 
 # ===============================
 # Create Order / Checkout Cart
@@ -34,19 +38,26 @@ def checkout_cart_route(
     if not payment_method:
         raise HTTPException(status_code=404, detail="Payment method not found")
 
-    # Create order (stock ignored)
+    # Checkout reads the cart from Postgres: write any pending cart changes first
+    cart_store.store.sync(db, current_user.id)
+
+    manual_providers = ["opay", "uba bank", "gtbank"]
+    manual = payment_method.provider.lower() in manual_providers
+
+    # Create order (stock held until payment; bank transfers get the longer window)
     db_order = crud.checkout_cart(
         db,
         user_id=current_user.id,
         address_id=request.address_id,
         coupon_ids=request.coupon_ids,
+        hold_seconds=reservations.MANUAL_RESERVATION_TTL if manual else reservations.RESERVATION_TTL,
     )
+    cart_store.store.checked_out(current_user.id, db_order.items)  # the cart was emptied in Postgres
 
     # Attach payment info
     db_order.payment_method = payment_method.provider
     db_order.payment_option_id = payment_method.id
-    manual_providers = ["opay", "uba bank", "gtbank"]
-    db_order.payment_status = "awaiting_confirmation" if payment_method.provider.lower() in manual_providers else "pending"
+    db_order.payment_status = "awaiting_confirmation" if manual else "pending"
 
     db.commit()
     db.refresh(db_order)
@@ -161,11 +172,13 @@ def get_all_orders(
 
 @router.get("/user")
 def get_my_orders(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,order_reference,status,total_amount (default: all)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_orders = crud.get_orders_by_user(db, current_user.id)
-    return response_format(db_orders, "User orders retrieved successfully")
+    selected = crud.parse_fields(fields, crud.ORDER_FIELDS)
+    db_orders = crud.get_orders_by_user(db, current_user.id, fields=selected)
+    return response_format(db_orders, "User orders retrieved successfully", schema=schemas.OrderOut)
 
 
 @router.get("/{order_id}")
@@ -276,7 +289,7 @@ def update_order_status(
             db_order
         )
 
-    return response_format(db_order, "Order status updated successfully")
+    return response_format(db_order, "Order status updated successfully", schema=schemas.OrderOut)
 
 # ===============================
 # Cancel Order (Owner or Admin)
@@ -327,7 +340,7 @@ def cancel_order(
                 order_data
             )
 
-        return response_format(db_order, "Order cancelled successfully")
+        return response_format(db_order, "Order cancelled successfully", schema=schemas.OrderOut)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -347,9 +360,11 @@ def delete_order(
         raise HTTPException(status_code=404, detail="Order not found")
 
     try:
-        # Delete the order and its items
+        # Delete the order and its items (an unpaid order's held stock goes back on sale)
+        released = reservations.release(db, [db_order.id])
         db.delete(db_order)
         db.commit()
+        reservations.invalidate(released)
         return response_format(None, f"Order {db_order.order_reference} deleted successfully")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -377,8 +392,10 @@ def delete_my_order(
         raise HTTPException(status_code=400, detail=f"Cannot delete order with status: {db_order.status}")
 
     try:
+        released = reservations.release(db, [db_order.id])
         db.delete(db_order)
         db.commit()
+        reservations.invalidate(released)
         return response_format(None, "Order deleted successfully")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -6,14 +6,33 @@ from roles import get_current_user
 from email_utilis import send_payment_received,send_payment_rejected
 from models import User, Order
 from models import PaymentOption
+import serialization
+import reservations
 
 router = APIRouter(
     prefix= "/payment",
     tags=["payment"]
 )
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
+
+
+def mark_paid(db: Session, db_order: Order) -> bool:
+    """
+    Record the payment and convert the order's stock holds into a sale.
+    Returns False for an order that was cancelled first (its hold expired or it
+    was cancelled): the stock is back on sale, so the payment is recorded but
+    the order stays cancelled for a refund.
+    """
+    db_order.payment_status = "paid"
+    if db_order.status == "cancelled":
+        db.commit()
+        return False
+    reservations.convert(db, db_order.id)
+    db_order.status = "processing"
+    db.commit()
+    return True
 
 
 # ===============================
@@ -27,7 +46,8 @@ def confirm_manual_payment(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
+    # Locked so the reservation sweeper cannot expire it mid-confirmation
+    db_order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -38,9 +58,10 @@ def confirm_manual_payment(
     if not payment_option or payment_option.provider.lower() not in ["manual", "bank_transfer", "opay"]:
         raise HTTPException(status_code=400, detail="Order is not a manual payment")
 
-    db_order.payment_status = "paid"
-    db_order.status = "processing"
-    db.commit()
+    if db_order.status == "cancelled":
+        raise HTTPException(status_code=400, detail="Order is cancelled (its stock hold may have expired)")
+
+    mark_paid(db, db_order)
     db.refresh(db_order)
 
     if db_order.user and db_order.user.email:
@@ -51,7 +72,7 @@ def confirm_manual_payment(
             db_order.total_amount,
         )
 
-    return response_format(db_order, "Manual payment confirmed")
+    return response_format(db_order, "Manual payment confirmed", schema=schemas.OrderOut)
 
 
 
@@ -64,7 +85,7 @@ def reject_manual_payment(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
+    db_order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -77,7 +98,9 @@ def reject_manual_payment(
 
     db_order.payment_status = "rejected"
     db_order.status = "cancelled"
+    released = reservations.release(db, [db_order.id])
     db.commit()
+    reservations.invalidate(released)
     db.refresh(db_order)
 
     if db_order.user and db_order.user.email:
@@ -88,7 +111,7 @@ def reject_manual_payment(
             reason
         )
 
-    return response_format(db_order, f"Payment rejected: {reason}")
+    return response_format(db_order, f"Payment rejected: {reason}", schema=schemas.OrderOut)
 
 
 @router.get("/payment-methods")
@@ -198,6 +221,10 @@ def initialize_paystack_payment(
     # Check if order is already paid
     if db_order.payment_status == "paid":
         raise HTTPException(status_code=400, detail="Order is already paid")
+
+    # An expired or cancelled order's stock is back on sale
+    if db_order.status == "cancelled":
+        raise HTTPException(status_code=400, detail="Order is cancelled")
     
     # Get user email
     user_email = db_order.user.email if db_order.user else current_user.email
@@ -289,8 +316,8 @@ def verify_paystack_payment(
     if not order_id:
         raise HTTPException(status_code=400, detail="Order ID not found in payment metadata")
     
-    # Fetch order from database
-    db_order = db.query(Order).filter(Order.id == order_id).first()
+    # Fetch order from database (locked against the reservation sweeper)
+    db_order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -300,10 +327,20 @@ def verify_paystack_payment(
     
     # Update order based on payment status
     if payment_status == "success":
-        db_order.payment_status = "paid"
-        db_order.status = "processing"
-        db.commit()
+        fulfilled = mark_paid(db, db_order)
         db.refresh(db_order)
+        if not fulfilled:
+            return response_format(
+                {
+                    "order_id": db_order.id,
+                    "order_reference": db_order.order_reference,
+                    "payment_status": db_order.payment_status,
+                    "order_status": db_order.status,
+                    "amount_paid": payment_data.get("amount", 0) / 100,
+                    "verification_data": payment_data
+                },
+                "Payment received for a cancelled order; it will be refunded"
+            )
         
         # Send confirmation email in background
         if db_order.user and db_order.user.email:
@@ -386,19 +423,17 @@ def process_successful_payment(db: Session, payment_data: dict):
             return  # Skip if no order_id in metadata
         
         # Fetch order
-        db_order = db.query(Order).filter(Order.id == order_id).first()
+        db_order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
         if not db_order:
             return
         
         # Update order status
         payment_status = payment_data.get("status")
         if payment_status == "success" and db_order.payment_status != "paid":
-            db_order.payment_status = "paid"
-            db_order.status = "processing"
-            db.commit()
+            fulfilled = mark_paid(db, db_order)
             
             # Send confirmation email
-            if db_order.user and db_order.user.email:
+            if fulfilled and db_order.user and db_order.user.email:
                 send_payment_received(
                     db_order.user.email,
                     db_order.order_reference,
@@ -5,7 +5,7 @@ from database import get_db
 import os, shutil
 from PIL import Image
 from roles import require_role
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Request
 from typing import Optional
 from fastapi.responses import FileResponse
 from roles import require_role
@@ -13,52 +13,77 @@ from models import Product, Category
 from datetime import datetime,timezone
 
 import os, shutil, requests,models
-from bs4 import BeautifulSoup
+import autocomplete
+from response_cache import cached_response, catalog_cache
+import product_stats
+import trending
+import bulk_import
+import remote_import
+import image_pipeline
+import media_store
+import media_server
+import scraper
+import asyncio, io, mimetypes
+from urllib.parse import urlsplit
+from starlette.concurrency import run_in_threadpool
+import serialization
 router = APIRouter(
     prefix="/products", tags=["Products"]
 )
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, pagination=None, schema=None, status_code=200):
+    extra = {"pagination": pagination} if pagination is not None else {}
+    return serialization.envelope(data, message, success, schema, status_code, **extra)
+
+
+def cursor_pagination(items, limit: int, next_cursor: Optional[str]):
+    return {"limit": limit, "count": len(items), "next_cursor": next_cursor}
 
 
 @router.get("/")
-def get_products(db: Session = Depends(get_db)):
-    db_products = crud.get_products(db)
-    return response_format(db_products, "All products retrieved successfully")
+def get_products(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's next_cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,name,price,thumbnail_url (default: all)"),
+    db: Session = Depends(get_db)
+):
+    selected = crud.parse_fields(fields, crud.PRODUCT_FIELDS)
 
+    def build():
+        db_products, next_cursor = crud.get_products(db, limit=limit, cursor=cursor, fields=selected)
+        return response_format(
+            db_products,
+            "Products retrieved successfully",
+            pagination=cursor_pagination(db_products, limit, next_cursor),
+            schema=schemas.ProductOut
+        )
+
+    return cached_response(request, ["products"], build)
 
 
-def scrape_image(source_url: str, save_path: str):
-    try:
-        response = requests.get(source_url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        img_tag = soup.find("img")
-        if not img_tag or "src" not in img_tag.attrs:
-            return None
-
-        img_url = img_tag["src"]
-        if img_url.startswith("//"):
-            img_url = "https:" + img_url
-        elif img_url.startswith("/"):
-            from urllib.parse import urljoin
-            img_url = urljoin(source_url, img_url)
-
-        img_data = requests.get(img_url).content
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, "wb") as f:
-            f.write(img_data)
-        return save_path
-    except Exception as e:
-        print(f"Error scraping image: {e}")
-        return None
+
+def create_scraped_product(db: Session, product_data: schemas.ProductCreate, image: Optional[tuple]):
+    """Store a scraped (bytes, content type, url) image like an upload and create the product."""
+    created = False
+    if image:
+        data, content_type, image_url = image
+        ext = mimetypes.guess_extension(content_type) or os.path.splitext(urlsplit(image_url).path)[1]
+        blob, created = media_store.save_stream(db, io.BytesIO(data), f"scraped{ext}", content_type)
+        product_data.image_url = media_store.url(blob)
+        product_data.image_hash = blob.hash
+        product_data.image_status = image_pipeline.PROCESSING
+
+    db_product = crud.create_product(db, product_data)
+    if image:
+        db_product = image_pipeline.attach(db, db_product, created)
+    return db_product
 
 # -------------------------------
 # Create product with optional image upload
 # -------------------------------
 @router.post("/")
-async def create_product(
+def create_product(
     name: str = Form(...),
     description: str = Form(...),
     price: float = Form(...),
@@ -75,31 +100,17 @@ async def create_product(
         category_id=category_id
     )
 
-    image_path = None
-    thumbnail_path = None
-
     if file:
-        os.makedirs("static/images", exist_ok=True)
-        # Save full image
-        image_path = f"static/images/{file.filename}"
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        product_data.image_url = image_path
-
-        # Generate thumbnail
-        thumbnail_size = (200, 200)  # pixels
-        image = Image.open(image_path)
-        image.thumbnail(thumbnail_size)
-        name, ext = os.path.splitext(file.filename)
-        thumbnail_filename = f"{name}_thumb{ext}"
-        thumbnail_path = f"static/images/{thumbnail_filename}"
-        image.save(thumbnail_path)
-
-        product_data.thumbnail_url = thumbnail_path
+        # Stored once per content hash; the thumbnail is built in the background
+        blob, created = media_store.save_upload(db, file)
+        product_data.image_url = media_store.url(blob)
+        product_data.image_hash = blob.hash
+        product_data.image_status = image_pipeline.PROCESSING
 
     db_product = crud.create_product(db, product_data)
-    return response_format(db_product, "Product created successfully")
+    if file:
+        db_product = image_pipeline.attach(db, db_product, created)
+    return response_format(db_product, "Product created successfully", schema=schemas.ProductOut)
 
 # -------------------------------
 # Create product from scraped image
@@ -109,7 +120,7 @@ async def create_product(
 
 
 @router.post("/scrape/")
-def create_product_from_url(
+async def create_product_from_url(
     name: str = Form(...),
     description: str = Form(...),
     price: float = Form(...),
@@ -126,69 +137,83 @@ def create_product_from_url(
         stock=stock,
         category_id=category_id
     )
-    save_path = f"static/images/{name.replace(' ', '_')}.jpg"
-    scraped_image_path = scrape_image(source_url, save_path)
-    product_data.image_url = scraped_image_path
+    # A failed scrape still creates the product, just without an image
+    try:
+        image = await scraper.scrape_image(source_url)
+    except scraper.ScrapeError as e:
+        print(f"Error scraping image: {e}")
+        image = None
 
-    db_product = crud.create_product(db, product_data)
-    return response_format(db_product, "Product created with scraped image successfully")
+    db_product = await run_in_threadpool(create_scraped_product, db, product_data, image)
+    return response_format(db_product, "Product created with scraped image successfully", schema=schemas.ProductOut)
 
 
-@router.post("/import-dummy-products")
-def import_all_products(db: Session = Depends(get_db)):
-    categories_url = "https://dummyjson.com/products/categories"
-    categories = requests.get(categories_url).json()  # list of dicts
+@router.post("/scrape/batch")
+async def create_products_from_urls(
+    batch: schemas.ProductScrapeBatch,
+    db: Session = Depends(get_db),
+    _= Depends(require_role("admin", "superadmin"))
+):
+    # All pages/images are fetched concurrently (per-host limits live in scraper)
+    images = await asyncio.gather(
+        *[scraper.scrape_image(item.source_url) for item in batch.items], return_exceptions=True
+    )
 
-    
+    results = []
+    for item, image in zip(batch.items, images):
+        error = None
+        if isinstance(image, Exception):
+            error = str(image) if isinstance(image, scraper.ScrapeError) else f"Unexpected error: {image}"
+            image = None
+        product_data = schemas.ProductCreate(**item.model_dump(exclude={"source_url"}))
+        try:
+            db_product = await run_in_threadpool(create_scraped_product, db, product_data, image)
+        except Exception as e:
+            await run_in_threadpool(db.rollback)
+            results.append({"source_url": item.source_url, "product_id": None, "error": f"Could not create product: {e}"})
+            continue
+        results.append({"source_url": item.source_url, "product_id": db_product.id, "image_url": db_product.image_url, "error": error})
 
-    imported_products = 0
-    imported_categories = 0
-
-    for cat in categories:
-        cat_name = cat["name"]  # For DB
-        cat_slug = cat["slug"]  # For API calls
-
-        print("Processing:", cat_name, cat_slug)  # Debugging
-
-        # ✅ Ensure category exists
-        category = db.query(Category).filter(Category.name == cat_name).first()
-        if not category:
-            category = Category(name=cat_name, description=f"Auto-imported {cat_name}")
-            db.add(category)
-            db.commit()
-            db.refresh(category)
-            imported_categories += 1
-
-        # ✅ Fetch products for this category using slug
-        products_url = f"https://dummyjson.com/products/category/{cat_slug}"
-        products_data = requests.get(products_url).json()
-        products = products_data.get("products", [])
-
-        
-
-        for p in products:
-            existing = db.query(Product).filter(Product.name == p["title"]).first()
-            if existing:
-                continue
-
-            product = Product(
-                name=p["title"],
-                description=p["description"],
-                price=float(p["price"]),
-                stock=int(p["stock"]),
-                image_url=p["images"][0] if p["images"] else None,
-                thumbnail_url=p["thumbnail"],
-                category_id=category.id,
-                created_at=datetime.now(timezone.utc)
-            )
-            db.add(product)
-            imported_products += 1
-
-        db.commit()
-
-    return {
-        "message": f"✅ Imported {imported_products} products across {imported_categories} categories"
-    }
+    return response_format(results, f"{sum(r['product_id'] is not None for r in results)} of {len(results)} products created")
+
+
+# -------------------------------
+# Bulk import (CSV / NDJSON feed)
+# -------------------------------
+@router.post("/import")
+def bulk_import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None, description="csv or ndjson; defaults to the file extension"),
+    batch_size: int = Form(bulk_import.BATCH_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    _=Depends(require_role("admin", "superadmin"))
+):
+    fmt = format or bulk_import.detect_format(file.filename)
+    if fmt not in bulk_import.FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported format; use csv or ndjson")
+
+    report = bulk_import.import_products(db, file.file, fmt, batch_size)
+    return response_format(
+        report,
+        f"Imported {report['inserted']} new and updated {report['updated']} products ({report['failed']} rows failed)"
+    )
+
+
+@router.post("/import-dummy-products", status_code=202)
+def import_all_products(background_tasks: BackgroundTasks):
+    # Runs after the response on the event loop; poll /products/import-jobs/{id} for progress
+    job = remote_import.create_job()
+    if job["status"] == "queued":
+        background_tasks.add_task(remote_import.run_import, job)
+    return response_format(job, "Import started", status_code=202)
+
+
+@router.get("/import-jobs/{job_id}")
+def get_import_job(job_id: str):
+    job = remote_import.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return response_format(job, f"Import job is {job['status']}")
 
 
 
@@ -197,26 +222,55 @@ def import_all_products(db: Session = Depends(get_db)):
 # -------------------------------
 @router.get("/top")
 def get_top_products(
-    limit: int = 10,
-    sort_by: str = "sales",  # can be 'sales' or 'views'
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    sort_by: str = Query("sales", pattern="^(sales|views|newest)$"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's next_cursor"),
     db: Session = Depends(get_db)
 ):
     """
     Returns top products based on sales count or views.
     Defaults to top 10 by sales.
     """
-    query = db.query(Product)
+    def build():
+        query = db.query(Product)
+
+        # Each ordering is an index scan: (sales_count, id), (view_count, id) or the primary key
+        if sort_by == "sales":
+            key_columns = [Product.sales_count, Product.id]
+        elif sort_by == "views":
+            key_columns = [Product.view_count, Product.id]
+        else:
+            key_columns = [Product.id]  # newest first
+
+        top_products, next_cursor = crud.paginate_keyset(query, key_columns, limit, cursor)
+        return response_format(
+            top_products,
+            f"Top {limit} products by {sort_by}",
+            pagination=cursor_pagination(top_products, limit, next_cursor),
+            schema=schemas.ProductOut
+        )
+
+    return cached_response(request, ["products"], build)
 
-    # You can adjust this depending on your Product model fields
-    if hasattr(Product, "sales_count") and sort_by == "sales":
-        query = query.order_by(Product.sales_count.desc())
-    elif hasattr(Product, "views") and sort_by == "views":
-        query = query.order_by(Product.views.desc())
-    else:
-        query = query.order_by(Product.created_at.desc())  # fallback
+# -------------------------------
+# Trending products (sliding window over views and sales)
+# -------------------------------
+@router.get("/trending")
+def get_trending_products(
+    window: str = Query("1h", pattern="^(1h|24h)$"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    scores = trending.tracker.top(window, limit)
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_([pid for pid, _ in scores])).all()} if scores else {}
 
-    top_products = query.limit(limit).all()
-    return response_format(top_products, f"Top {limit} products by {sort_by}")
+    data = [
+        {"score": score, "product": products[pid]}
+        for pid, score in scores
+        if pid in products
+    ]
+    return response_format(data, f"Trending products in the last {window}", schema=schemas.TrendingProductOut)
 
 # -------------------------------
 # Download product image
@@ -229,11 +283,19 @@ def search_products(
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
     min_price: Optional[float] = Query(None, description="Minimum price"),
     max_price: Optional[float] = Query(None, description="Maximum price"),
-    sort: Optional[str] = Query("relevance", description="Sort by: price_asc, price_desc, name_asc, name_desc"),
+    sort: Optional[str] = Query("relevance", description="Sort by: relevance, price_asc, price_desc, name_asc, name_desc"),
+    mode: str = Query("fulltext", pattern="^(fulltext|fuzzy|basic)$", description="fulltext (ranked), fuzzy (typo-tolerant) or basic (substring match)"),
     skip: int = Query(0, ge=0, description="Number of items to skip for pagination"),
     limit: int = Query(20, ge=1, le=100, description="Max number of items to return"),
+    facets: Optional[str] = Query(None, description="Comma-separated facet counts to include: category, price"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,name,price,thumbnail_url (default: all)"),
     db: Session = Depends(get_db)
 ):
+    selected = crud.parse_fields(fields, crud.PRODUCT_FIELDS)
+    requested_facets = [f.strip() for f in facets.split(",") if f.strip()] if facets else []
+    unknown = set(requested_facets) - set(crud.SEARCH_FACETS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown facets: {', '.join(sorted(unknown))}")
    
     results = crud.search_products(
         db=db,
@@ -243,41 +305,94 @@ def search_products(
         max_price=max_price,
         sort=sort,
         skip=skip,
-        limit=limit
+        limit=limit,
+        mode=mode,
+        fields=selected
     )
-    return {
-        "success": True,
-        "message": "Search results retrieved successfully",
+
+    # 💡 Nothing matched → offer the closest product names instead
+    suggestions = crud.suggest_product_names(db, q) if not results and skip == 0 else []
+    if results:
+        autocomplete.index.record_query(q)
+
+    extra = {
         "pagination": {
             "skip": skip,
             "limit": limit,
             "count": len(results)
         },
-        "data": results
+        "suggestions": suggestions
     }
+    if requested_facets:
+        extra["facets"] = crud.search_facets(
+            db=db,
+            q=q,
+            facets=requested_facets,
+            category_id=category_id,
+            min_price=min_price,
+            max_price=max_price,
+            mode=mode
+        )
+    return serialization.envelope(
+        results, "Search results retrieved successfully", schema=schemas.ProductOut, **extra
+    )
+
+# -------------------------------
+# Autocomplete (served from memory, no DB round trip)
+# -------------------------------
+@router.get("/autocomplete")
+async def autocomplete_products(
+    prefix: str = Query(..., min_length=1, max_length=100, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=20),
+):
+    suggestions = autocomplete.index.complete(prefix, limit)
+    return response_format(suggestions, "Autocomplete suggestions retrieved successfully")
+
+
+# -------------------------------
+# Catalog cache stats (for sizing CATALOG_CACHE_SIZE / CATALOG_CACHE_TTL)
+# -------------------------------
+@router.get("/cache/stats")
+def get_cache_stats(_=Depends(require_role("admin", "superadmin"))):
+    return response_format(catalog_cache.stats(), "Catalog cache stats retrieved successfully")
+
 
 @router.get("/download/{product_id}")
-def download_image(product_id: int, db: Session = Depends(get_db)):
-    db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if not db_product or not db_product.image_url:
-        raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(db_product.image_url)
+def download_image(product_id: int, request: Request, db: Session = Depends(get_db)):
+    # product → file comes from memory; the DB is only hit on a miss
+    for _ in range(2):
+        entry = media_server.product_media.get(db, product_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Image not found")
+        try:
+            return media_server.serve(request, *entry)
+        except FileNotFoundError:
+            # Stale entry (image replaced and collected meanwhile): look it up again
+            media_server.product_media.forget(product_id)
+    raise HTTPException(status_code=404, detail="Image not found")
 
 
 
 
 @router.get("/{product_id}")
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    db_product = crud.get_product(db, product_id)
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return response_format(db_product, "Product retrieved successfully")
+def get_product(product_id: int, request: Request, db: Session = Depends(get_db)):
+    def build():
+        db_product = crud.get_product(db, product_id)
+        if not db_product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return response_format(db_product, "Product retrieved successfully", schema=schemas.ProductOut)
+
+    response = cached_response(request, [f"product:{product_id}"], build)
+    # 👀 Buffered; flushed to products.view_count in batches by product_stats
+    product_stats.record_view(product_id)
+    trending.tracker.record_view(product_id)
+    return response
 
 # -------------------------------
 # Update product
 # -------------------------------
 @router.put("/{product_id}")
-async def update_product(
+def update_product(
     product_id: int,
     name: str = Form(...),
     description: str = Form(...),
@@ -299,24 +414,18 @@ async def update_product(
         category_id=category_id
     )
 
-    # Handle image upload
+    # Handle image upload; the thumbnail is built in the background
+    if file:
+        blob, created = media_store.save_upload(db, file)
+        update_data.image_url = media_store.url(blob)
+        update_data.image_hash = blob.hash
+        update_data.image_status = image_pipeline.PROCESSING
+        update_data.image_variants = None  # the old srcset no longer matches the new image
+
+    updated_product = crud.update_product(db, product_id, update_data)
     if file:
-        os.makedirs("static/images", exist_ok=True)
-        image_path = f"static/images/{file.filename}"
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        update_data.image_url = image_path
-
-        # Generate thumbnail
-        image = Image.open(image_path)
-        image.thumbnail((200, 200))
-        name_, ext = os.path.splitext(file.filename)
-        thumbnail_path = f"static/images/{name_}_thumb{ext}"
-        image.save(thumbnail_path)
-        update_data.thumbnail_url = thumbnail_path
-
-    updated_product = crud.update_product(db, db_product, update_data)
-    return response_format(updated_product, "Product updated successfully")
+        updated_product = image_pipeline.attach(db, updated_product, created)
+    return response_format(updated_product, "Product updated successfully", schema=schemas.ProductOut)
 
 
 # -------------------------------
@@ -2,13 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 import schemas, crud
 from database import get_db
+import serialization
 
 router = APIRouter(
     prefix="/reviews", tags=["Reviews"]
 )
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
 
 
 # ===============================
@@ -17,7 +18,7 @@ def response_format(data=None, message="Success", success=True):
 @router.post("/")
 def create_review(review: schemas.ReviewCreate, db: Session = Depends(get_db)):
     db_review = crud.create_review(db, review)
-    return response_format(db_review, "Review created successfully")
+    return response_format(db_review, "Review created successfully", schema=schemas.ReviewOut)
 
 
 # ===============================
@@ -28,7 +29,7 @@ def get_review(review_id: int, db: Session = Depends(get_db)):
     db_review = crud.get_review(db, review_id)
     if not db_review:
         raise HTTPException(status_code=404, detail="Review not found")
-    return response_format(db_review, "Review retrieved successfully")
+    return response_format(db_review, "Review retrieved successfully", schema=schemas.ReviewOut)
 
 
 # ===============================
@@ -37,7 +38,7 @@ def get_review(review_id: int, db: Session = Depends(get_db)):
 @router.get("/product/{product_id}")
 def get_reviews_by_product(product_id: int, db: Session = Depends(get_db)):
     db_reviews = crud.get_reviews_by_product(db, product_id)
-    return response_format(db_reviews, "Product reviews retrieved successfully")
+    return response_format(db_reviews, "Product reviews retrieved successfully", schema=schemas.ReviewOut)
 
 
 # ===============================
@@ -46,7 +47,7 @@ def get_reviews_by_product(product_id: int, db: Session = Depends(get_db)):
 @router.get("/user/{user_id}")
 def get_reviews_by_user(user_id: int, db: Session = Depends(get_db)):
     db_reviews = crud.get_reviews_by_user(db, user_id)
-    return response_format(db_reviews, "User reviews retrieved successfully")
+    return response_format(db_reviews, "User reviews retrieved successfully", schema=schemas.ReviewOut)
 
 
 # ===============================
@@ -57,4 +58,4 @@ def delete_review(review_id: int, db: Session = Depends(get_db)):
     db_review = crud.delete_review(db, review_id)
     if not db_review:
         raise HTTPException(status_code=404, detail="Review not found")
-    return response_format(db_review, "Review deleted successfully")
+    return response_format(db_review, "Review deleted successfully", schema=schemas.ReviewOut)
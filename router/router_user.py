@@ -3,11 +3,12 @@ from sqlalchemy.orm import Session
 import schemas, crud, models
 from database import get_db
 from roles import require_role
+import serialization
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
 
 
 # ===============================
@@ -59,7 +60,7 @@ def get_user(user_id: int, db: Session = Depends(get_db), _=Depends(require_role
     db_user = crud.get_user(db, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return response_format(db_user, "User retrieved successfully")
+    return response_format(db_user, "User retrieved successfully", schema=schemas.UserOut)
 
 
 # ===============================
@@ -68,7 +69,7 @@ def get_user(user_id: int, db: Session = Depends(get_db), _=Depends(require_role
 @router.get("/")
 def get_users(db: Session = Depends(get_db), _=Depends(require_role("superadmin"))):
     db_users = crud.get_users(db)
-    return response_format(db_users, "All users retrieved successfully")
+    return response_format(db_users, "All users retrieved successfully", schema=schemas.UserOut)
 
 
 # ===============================
@@ -84,7 +85,7 @@ def update_user(
     db_user = crud.update_user(db, user_id, user)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return response_format(db_user, "User updated successfully")
+    return response_format(db_user, "User updated successfully", schema=schemas.UserOut)
 
 
 # ===============================
@@ -95,4 +96,4 @@ def delete_user(user_id: int, db: Session = Depends(get_db), _=Depends(require_r
     db_user = crud.delete_user(db, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return response_format(db_user, "User deleted successfully")
+    return response_format(db_user, "User deleted successfully", schema=schemas.UserOut)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 import schemas, crud
 from database import get_db
+import serialization
 
 router = APIRouter(
    prefix="/wishlist",
@@ -10,28 +11,28 @@ router = APIRouter(
 
 
 
-def response_format(data=None, message="Success", success=True):
-    return {"success": success, "message": message, "data": data}
+def response_format(data=None, message="Success", success=True, schema=None):
+    return serialization.envelope(data, message, success, schema)
 
 @router.post("/")
 def create_wishlist(wishlist: schemas.WishlistCreate, db: Session = Depends(get_db)):
-    return response_format(crud.create_wishlist(db, wishlist), "Wishlist item created successfully")
+    return response_format(crud.create_wishlist(db, wishlist), "Wishlist item created successfully", schema=schemas.WishlistOut)
 
 @router.get("/{wishlist_id}")
 def get_wishlist(wishlist_id: int, db: Session = Depends(get_db)):
     db_wishlist = crud.get_wishlist_by_id(db, wishlist_id)
     if not db_wishlist:
         raise HTTPException(status_code=404, detail="Wishlist item not found")
-    return response_format(db_wishlist, "Wishlist retrieved successfully")
+    return response_format(db_wishlist, "Wishlist retrieved successfully", schema=schemas.WishlistOut)
 
 @router.get("/user/{user_id}")
 def get_user_wishlist(user_id: int, db: Session = Depends(get_db)):
     db_wishlist = crud.get_user_wishlist(db, user_id)
-    return response_format(db_wishlist, "User wishlist retrieved successfully")
+    return response_format(db_wishlist, "User wishlist retrieved successfully", schema=schemas.WishlistOut)
 
 @router.delete("/{wishlist_id}")
 def delete_wishlist(wishlist_id: int, db: Session = Depends(get_db)):
     db_wishlist = crud.delete_wishlist(db, wishlist_id)
     if not db_wishlist:
         raise HTTPException(status_code=404, detail="Wishlist item not found")
-    return response_format(db_wishlist, "Wishlist item deleted successfully")
+    return response_format(db_wishlist, "Wishlist item deleted successfully", schema=schemas.WishlistOut)
@@ -0,0 +1,54 @@
+import threading
+import traceback
+from typing import Callable, List
+
+# scheduler.py
+# Tiny in-process periodic job runner for housekeeping work that must not sit
+# on the request path (flushing buffered counters, snapshots, sweepers).
+# Jobs register at import time with @every(...) and main.py starts/stops them
+# with the app. Each job gets its own daemon thread.
+
+_jobs: List[dict] = []
+_threads: List[threading.Thread] = []
+_stop = threading.Event()
+
+
+def every(seconds: float, run_on_shutdown: bool = False):
+    """Register `fn` to run every `seconds` (and once more at shutdown if asked)."""
+    def decorator(fn: Callable[[], None]):
+        _jobs.append({"fn": fn, "interval": seconds, "run_on_shutdown": run_on_shutdown})
+        return fn
+    return decorator
+
+
+def _run(job: dict):
+    try:
+        job["fn"]()
+    except Exception:
+        print(f"⚠️  Scheduled job {job['fn'].__name__} failed:")
+        traceback.print_exc()
+
+
+def _loop(job: dict):
+    while not _stop.wait(job["interval"]):
+        _run(job)
+
+
+def start():
+    if _threads:
+        return
+    _stop.clear()
+    for job in _jobs:
+        thread = threading.Thread(target=_loop, args=(job,), name=f"job:{job['fn'].__name__}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def stop():
+    _stop.set()
+    for thread in _threads:
+        thread.join(timeout=5)
+    _threads.clear()
+    for job in _jobs:
+        if job["run_on_shutdown"]:
+            _run(job)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, model_validator
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # ===============================
@@ -121,6 +121,9 @@ class ProductBase(BaseModel):
     stock: int = 0
     image_url: Optional[str] = None   # Full-size image
     thumbnail_url: Optional[str] = None  # 👈 Thumbnail
+    image_status: Optional[str] = None  # processing / ready / failed (set by image_pipeline)
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None  # format -> {"400w": path} for srcset
+    image_hash: Optional[str] = None  # content hash of the uploaded image (media_store)
     category_id: int
 
 class ProductCreate(ProductBase):
@@ -133,7 +136,11 @@ class ProductUpdate(BaseModel):
     stock: Optional[int] = None
     image_url: Optional[str] = None
     thumbnail_url: Optional[str] = None 
+    image_status: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    image_hash: Optional[str] = None
     category_id: Optional[int] = None
+    is_active: Optional[bool] = None  # soft delete: False drops it from autocomplete and category stats
 
 class Product(ProductBase):
     id: int
@@ -142,6 +149,17 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductScrapeItem(BaseModel):
+    name: str
+    description: Optional[str] = None
+    price: float
+    stock: int = 0
+    category_id: int
+    source_url: str  # product page or direct image URL
+
+class ProductScrapeBatch(BaseModel):
+    items: List[ProductScrapeItem] = Field(..., min_length=1, max_length=50)
+
 # ===============================
 # Wishlist Schemas
 # ===============================
@@ -213,6 +231,9 @@ class CartItemBase(BaseModel):
 class CartItemCreate(CartItemBase):
     pass
 
+class CartItemBatch(BaseModel):
+    items: List[CartItemCreate] = Field(..., min_length=1, max_length=100)
+
 class CartItemUpdate(BaseModel):
     quantity: Optional[int] = None
 
@@ -347,3 +368,127 @@ class Review(ReviewBase):
 
     class Config:
         from_attributes = True
+
+# ===============================
+# Response Schemas (the "data" of router responses, see serialization.py)
+# ===============================
+class OrmResponse(BaseModel):
+    """
+    Reads only what is already loaded on an ORM instance, so serializing never
+    triggers a lazy load. Columns that were not loaded (e.g. outside ?fields=)
+    stay unset and are left out of the output. Every field is optional for that reason.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _loaded_only(cls, data):
+        state = getattr(data, "_sa_instance_state", None)
+        return state.dict if state is not None else data
+
+class ProductOut(OrmResponse):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    stock: Optional[int] = None  # available to sell
+    reserved_stock: Optional[int] = None  # held by unpaid orders
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    image_status: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    image_hash: Optional[str] = None
+    category_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    is_active: Optional[bool] = None
+    sales_count: Optional[int] = None
+    view_count: Optional[int] = None
+
+class TrendingProductOut(BaseModel):
+    score: int
+    product: ProductOut
+
+class CategoryStatsOut(OrmResponse):
+    product_count: int = 0
+    in_stock_count: int = 0
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+class CategoryOut(OrmResponse):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    parent_id: Optional[int] = None
+    stats: Optional[CategoryStatsOut] = None
+
+class CategoryTreeOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    parent_id: Optional[int] = None
+    stats: Optional[CategoryStatsOut] = None
+    children: List["CategoryTreeOut"] = []
+
+class OrderOut(OrmResponse):
+    id: Optional[int] = None
+    order_reference: Optional[str] = None
+    user_id: Optional[int] = None
+    address_id: Optional[int] = None
+    status: Optional[str] = None
+    payment_method: Optional[str] = None
+    payment_status: Optional[str] = None
+    payment_option_id: Optional[int] = None
+    total_amount: Optional[float] = None
+    discount_amount: Optional[float] = None
+    created_at: Optional[datetime] = None
+    shipped_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+
+class CouponOut(OrmResponse):
+    id: Optional[int] = None
+    code: Optional[str] = None
+    discount_percent: Optional[float] = None
+    valid_from: Optional[datetime] = None
+    valid_to: Optional[datetime] = None
+    active: Optional[bool] = None
+
+class AddressOut(OrmResponse):
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    address_line: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+    postal_code: Optional[str] = None
+    phone_number: Optional[str] = None
+
+class ReviewOut(OrmResponse):
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    product_id: Optional[int] = None
+    rating: Optional[int] = None
+    comment: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class WishlistOut(OrmResponse):
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    product_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    product: Optional[ProductOut] = None  # only when eager-loaded (crud.get_user_wishlist)
+
+class CartItemOut(OrmResponse):
+    id: Optional[int] = None
+    cart_id: Optional[int] = None
+    product_id: Optional[int] = None
+    quantity: Optional[int] = None
+    price_at_addition: Optional[float] = None
+
+class UserOut(OrmResponse):
+    # No password hash or verification/reset codes
+    id: Optional[int] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+    is_verified: Optional[bool] = None
+    created_at: Optional[datetime] = None
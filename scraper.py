@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+# scraper.py
+# Async fetcher behind POST /products/scrape/ and /products/scrape/batch.
+# One pooled httpx client with strict timeouts and a response-size cap; every
+# host gets its own concurrency limit and minimum spacing between requests so
+# a batch never hammers one shop. Fetched bodies are kept on disk keyed by URL:
+# within SCRAPE_CACHE_TTL they are reused as-is, after that they are
+# revalidated with If-None-Match / If-Modified-Since and a 304 reuses the body.
+
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "10"))
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(10 * 1024 * 1024)))
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "16"))
+SCRAPE_PER_HOST = int(os.getenv("SCRAPE_PER_HOST", "2"))            # parallel requests per host
+SCRAPE_HOST_INTERVAL = float(os.getenv("SCRAPE_HOST_INTERVAL", "0.5"))  # seconds between request starts per host
+SCRAPE_CACHE_DIR = os.getenv("SCRAPE_CACHE_DIR", "data/scrape_cache")
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "3600"))
+USER_AGENT = "LuxeNextBot/1.0 (+product image import)"
+
+
+class ScrapeError(Exception):
+    pass
+
+
+class HostLimiter:
+    """Per-host semaphore plus a minimum interval between request starts."""
+
+    def __init__(self, per_host: int = SCRAPE_PER_HOST, interval: float = SCRAPE_HOST_INTERVAL):
+        self.per_host = per_host
+        self.interval = interval
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._next_start: Dict[str, float] = {}
+
+    async def wait_turn(self, host: str):
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def slot(self, host: str) -> asyncio.Semaphore:
+        return self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+
+
+_client: Optional[httpx.AsyncClient] = None
+_limiter = HostLimiter()
+_global_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client, _global_slots
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(SCRAPE_TIMEOUT, connect=min(5.0, SCRAPE_TIMEOUT)),
+            limits=httpx.Limits(max_connections=SCRAPE_CONCURRENCY, max_keepalive_connections=SCRAPE_CONCURRENCY),
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        )
+        _global_slots = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+    return _client
+
+
+async def close():
+    global _client, _global_slots
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _global_slots = None
+
+
+# -------------------------------
+# Disk cache
+# -------------------------------
+def _cache_paths(url: str) -> Tuple[str, str]:
+    key = hashlib.sha256(url.encode()).hexdigest()
+    return f"{SCRAPE_CACHE_DIR}/{key}.json", f"{SCRAPE_CACHE_DIR}/{key}.body"
+
+
+def _cache_load(url: str) -> Optional[Tuple[dict, bytes]]:
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_store(url: str, meta: dict, body: Optional[bytes]):
+    meta_path, body_path = _cache_paths(url)
+    os.makedirs(SCRAPE_CACHE_DIR, exist_ok=True)
+    if body is not None:
+        with open(f"{body_path}.tmp", "wb") as f:
+            f.write(body)
+        os.replace(f"{body_path}.tmp", body_path)
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+
+# -------------------------------
+# Fetching
+# -------------------------------
+async def _download(url: str, headers: dict) -> Tuple[httpx.Response, bytes]:
+    """GET with the size cap enforced while streaming."""
+    client = _get_client()
+    async with client.stream("GET", url, headers=headers) as response:
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > SCRAPE_MAX_BYTES:
+            raise ScrapeError(f"{url} is larger than {SCRAPE_MAX_BYTES} bytes")
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if len(body) > SCRAPE_MAX_BYTES:
+                raise ScrapeError(f"{url} is larger than {SCRAPE_MAX_BYTES} bytes")
+    return response, bytes(body)
+
+
+async def fetch(url: str) -> Tuple[bytes, Optional[str]]:
+    """(body, content type) of `url`, from the disk cache when still valid."""
+    if urlsplit(url).scheme not in ("http", "https"):
+        raise ScrapeError(f"Unsupported URL {url!r}")
+    cached = await asyncio.to_thread(_cache_load, url)
+    if cached and time.time() - cached[0]["fetched_at"] < SCRAPE_CACHE_TTL:
+        return cached[1], cached[0].get("content_type")
+
+    headers = {}
+    if cached:
+        if cached[0].get("etag"):
+            headers["If-None-Match"] = cached[0]["etag"]
+        if cached[0].get("last_modified"):
+            headers["If-Modified-Since"] = cached[0]["last_modified"]
+
+    host = urlsplit(url).netloc
+    _get_client()
+    async with _global_slots, _limiter.slot(host):
+        await _limiter.wait_turn(host)
+        try:
+            response, content = await _download(url, headers)
+        except httpx.HTTPError as e:
+            raise ScrapeError(f"Could not fetch {url}: {e}") from e
+
+    if response.status_code == 304 and cached:
+        meta, body = cached
+        meta["fetched_at"] = time.time()
+        await asyncio.to_thread(_cache_store, url, meta, None)
+        return body, meta.get("content_type")
+    if response.status_code >= 400:
+        raise ScrapeError(f"{url} returned HTTP {response.status_code}")
+
+    meta = {
+        "url": url,
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+        "content_type": response.headers.get("content-type"),
+        "fetched_at": time.time(),
+    }
+    await asyncio.to_thread(_cache_store, url, meta, content)
+    return content, meta["content_type"]
+
+
+def find_image_url(html: bytes, base_url: str) -> Optional[str]:
+    """The product image of a page: og:image if present, else the first <img>."""
+    soup = BeautifulSoup(html, "html.parser")
+    og = soup.find("meta", property="og:image")
+    if og and og.get("content"):
+        return urljoin(base_url, og["content"])
+    img_tag = soup.find("img", src=True)
+    if img_tag:
+        return urljoin(base_url, img_tag["src"])
+    return None
+
+
+async def scrape_image(source_url: str) -> Tuple[bytes, str, str]:
+    """(image bytes, content type, image URL) for a page or a direct image URL."""
+    body, content_type = await fetch(source_url)
+    image_url = source_url
+    if not (content_type or "").startswith("image/"):
+        image_url = await asyncio.to_thread(find_image_url, body, source_url)
+        if not image_url:
+            raise ScrapeError(f"No image found on {source_url}")
+        body, content_type = await fetch(image_url)
+        if not (content_type or "").startswith("image/"):
+            raise ScrapeError(f"{image_url} is not an image ({content_type})")
+    return body, content_type.split(";")[0], image_url
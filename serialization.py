@@ -0,0 +1,44 @@
+import functools
+from typing import Any, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+# serialization.py
+# Fast path for the {"success", "message", "data"} envelope every router returns.
+# `data` is validated into its declared response model (schemas.*Out) through
+# a TypeAdapter built once per type, dumped by pydantic-core and encoded with
+# orjson, instead of FastAPI walking ORM objects with jsonable_encoder.
+# Payloads without a declared model (plain dicts built by a handler) still go
+# through jsonable_encoder.
+
+
+@functools.lru_cache(maxsize=None)
+def type_adapter(tp) -> TypeAdapter:
+    return TypeAdapter(tp)
+
+
+def dump(data: Any, schema: type) -> Any:
+    """`data` (an ORM object or a list of them) as plain Python via `schema`; unloaded columns are left out."""
+    if data is None:
+        return None
+    adapter = type_adapter(List[schema] if isinstance(data, (list, tuple)) else schema)
+    return adapter.dump_python(adapter.validate_python(data), exclude_unset=True)
+
+
+def envelope(
+    data: Any = None,
+    message: str = "Success",
+    success: bool = True,
+    schema: Optional[type] = None,
+    status_code: int = 200,
+    **extra: Any
+) -> ORJSONResponse:
+    content = {
+        "success": success,
+        "message": message,
+        "data": dump(data, schema) if schema is not None else jsonable_encoder(data),
+    }
+    content.update(extra)
+    return ORJSONResponse(content, status_code=status_code)
@@ -0,0 +1,176 @@
+import heapq
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import scheduler
+
+# trending.py
+# Sliding-window "trending" products without GROUP BYs over order_items.
+# Every window is a ring of time buckets, and every bucket is a fixed-size
+# Space-Saving summary, so memory is bounded by windows × buckets × capacity no
+# matter how many products are viewed. Each window also keeps the running sum
+# of its buckets, updated on every add and bucket expiry, so a read ranks those
+# totals without merging buckets. Snapshots go to disk so a restart keeps history.
+
+# window -> (bucket width in seconds, number of buckets)
+WINDOWS = {
+    "1h": (300, 12),
+    "24h": (3600, 24),
+}
+CAPACITY = int(os.getenv("TRENDING_CAPACITY", "200"))   # counters per bucket
+VIEW_WEIGHT = 1
+SALE_WEIGHT = int(os.getenv("TRENDING_SALE_WEIGHT", "10"))  # per unit sold
+# top() still ranks up to buckets × CAPACITY totals (4800 for 24h), about a
+# millisecond, so results are reused for this long
+READ_CACHE_SECONDS = 5
+SNAPSHOT_PATH = os.getenv("TRENDING_SNAPSHOT_PATH", "data/trending_snapshot.json")
+SNAPSHOT_INTERVAL = float(os.getenv("TRENDING_SNAPSHOT_INTERVAL", "60"))
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary (Metwally et al.).
+    Keeps at most `capacity` counters; a new item replaces the current minimum
+    and inherits its count, so true heavy hitters are never dropped.
+    """
+
+    def __init__(self, capacity: int, counts: Dict[int, int] = None):
+        self.capacity = capacity
+        self.counts: Dict[int, int] = dict(counts or {})
+
+    def add(self, item: int, weight: int = 1) -> Optional[Tuple[int, int]]:
+        """Returns (evicted item, its count) when `item` took over a counter."""
+        counts = self.counts
+        if item in counts:
+            counts[item] += weight
+        elif len(counts) < self.capacity:
+            counts[item] = weight
+        else:
+            victim = min(counts, key=counts.__getitem__)
+            evicted = counts.pop(victim)
+            counts[item] = evicted + weight
+            return victim, evicted
+        return None
+
+
+class SlidingWindow:
+    def __init__(self, width: int, size: int, capacity: int):
+        self.width = width
+        self.size = size
+        self.capacity = capacity
+        self.buckets: Dict[int, SpaceSaving] = {}  # bucket start (epoch s) -> summary
+        self.totals: Dict[int, int] = {}  # item -> sum of its counts over the live buckets
+
+    def add(self, item: int, weight: int, now: float):
+        start = int(now // self.width) * self.width
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            bucket = self.buckets[start] = SpaceSaving(self.capacity)
+            self._expire(now)
+        evicted = bucket.add(item, weight)
+        if evicted:
+            # The new item inherited the victim's count in this bucket
+            victim, count = evicted
+            self._subtract(victim, count)
+            weight += count
+        self.totals[item] = self.totals.get(item, 0) + weight
+
+    def top(self, k: int, now: float) -> List[Tuple[int, int]]:
+        self._expire(now)
+        return heapq.nlargest(k, self.totals.items(), key=lambda pair: pair[1])
+
+    def recount(self):
+        """Rebuild the totals from the buckets, e.g. after loading a snapshot."""
+        self.totals = {}
+        for bucket in self.buckets.values():
+            for item, count in bucket.counts.items():
+                self.totals[item] = self.totals.get(item, 0) + count
+
+    def _subtract(self, item: int, count: int):
+        left = self.totals.get(item, 0) - count
+        if left > 0:
+            self.totals[item] = left
+        else:
+            self.totals.pop(item, None)
+
+    def _expire(self, now: float):
+        oldest = int(now // self.width) * self.width - (self.size - 1) * self.width
+        for start in [s for s in self.buckets if s < oldest]:
+            for item, count in self.buckets.pop(start).counts.items():
+                self._subtract(item, count)
+
+
+class TrendingTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.windows = {name: SlidingWindow(width, size, CAPACITY) for name, (width, size) in WINDOWS.items()}
+        self._read_cache: Dict[Tuple[str, int], Tuple[float, list]] = {}
+
+    def record(self, product_id: int, weight: int = VIEW_WEIGHT):
+        now = time.time()
+        with self._lock:
+            for window in self.windows.values():
+                window.add(product_id, weight, now)
+
+    def record_view(self, product_id: int):
+        self.record(product_id, VIEW_WEIGHT)
+
+    def record_sale(self, product_id: int, quantity: int):
+        self.record(product_id, SALE_WEIGHT * quantity)
+
+    def top(self, window: str, k: int = 10) -> List[Tuple[int, int]]:
+        """[(product_id, score)] for the window, highest first."""
+        now = time.time()
+        cached = self._read_cache.get((window, k))
+        if cached and cached[0] > now:
+            return cached[1]
+        with self._lock:
+            result = self.windows[window].top(k, now)
+            self._read_cache[(window, k)] = (now + READ_CACHE_SECONDS, result)
+        return result
+
+    def snapshot(self, path: str = SNAPSHOT_PATH):
+        # Copy the counters under the lock: record() keeps mutating and evicting them
+        with self._lock:
+            data = {
+                name: {str(start): dict(bucket.counts) for start, bucket in window.buckets.items()}
+                for name, window in self.windows.items()
+            }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def restore(self, path: str = SNAPSHOT_PATH):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not read trending snapshot {path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for name, buckets in data.items():
+                window = self.windows.get(name)
+                if not window:
+                    continue
+                for start, counts in buckets.items():
+                    window.buckets[int(start)] = SpaceSaving(
+                        window.capacity, {int(item): count for item, count in counts.items()}
+                    )
+                window.recount()
+                window._expire(now)
+
+
+tracker = TrendingTracker()
+
+
+@scheduler.every(SNAPSHOT_INTERVAL, run_on_shutdown=True)
+def snapshot_trending_job():
+    tracker.snapshot()